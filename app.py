@@ -1,20 +1,32 @@
 import csv
-import json
-import io
+import functools
+import hashlib
 import logging
 import html
 import os
 import re
 import shutil
+import sys
+import types
 from datetime import datetime, timezone
 from pathlib import Path
 
-from sqlalchemy import func, text
-import bleach
-import markdown
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows dev environments
+    fcntl = None
+
+from sqlalchemy import case, func, select, text, update
+from sqlalchemy.orm import joinedload, selectinload
+import jinja2
+import nh3
+import orjson
+from markupsafe import Markup
+from markdown_it_pyrs import MarkdownIt
 from flask import (
     Flask,
     Response,
+    abort,
     flash,
     g,
     jsonify,
@@ -22,12 +34,14 @@ from flask import (
     render_template,
     request,
     send_from_directory,
+    stream_with_context,
     url_for,
 )
+from flask.json.provider import DefaultJSONProvider
 
 from config import Config, DATA_DIR, PROCESSED_DIR, UPLOAD_DIR
 from db import db
-from grading.schemas import safe_json_loads
+from grading.schemas import dump_json, safe_json_loads
 from grading.schemas import render_grade_output, validate_grade_result
 from models import (
     Assignment,
@@ -50,28 +64,43 @@ from processing.file_ingest import (
 )
 from processing.job_queue import (
     enqueue_assignment_job,
+    enqueue_cleanup_job,
     enqueue_rubric_job,
     enqueue_submission_job,
+    enqueue_submission_jobs,
     init_job_queue,
 )
 
 logger = logging.getLogger(__name__)
 
-_PRICE_ESTIMATE_RE = re.compile(r"price_estimate=\$([0-9]+(?:\.[0-9]+)?)")
-_IMAGE_CAPABLE_MODELS = {
-    "gpt-4o-mini",
-    "gpt-4o",
-    "gpt-4.1",
-    "gpt-4.1-mini",
-    "gpt-5",
-    "gpt-5-mini",
-    "gpt-5-nano",
-    "o4-mini",
-}
-_NON_IMAGE_MODELS = {
-    "o3-mini",
-}
-_MODEL_OPTIONS = [
+_PRICE_ESTIMATE_PREFIX = "price_estimate=$"
+_IMAGE_CAPABLE_MODELS = frozenset(
+    map(
+        sys.intern,
+        (
+            "gpt-4o-mini",
+            "gpt-4o",
+            "gpt-4.1",
+            "gpt-4.1-mini",
+            "gpt-5",
+            "gpt-5-mini",
+            "gpt-5-nano",
+            "o4-mini",
+        ),
+    )
+)
+_NON_IMAGE_MODELS = frozenset(map(sys.intern, ("o3-mini",)))
+# Exact-name capability lookup; prefix matching stays as the fallback.
+_MODEL_IMAGE_CAP = {model: True for model in _IMAGE_CAPABLE_MODELS}
+_MODEL_IMAGE_CAP.update((model, False) for model in _NON_IMAGE_MODELS)
+# Dated variants like gpt-4o-2024-08-06 fall through to these prefix DFAs.
+_NON_IMAGE_RE = re.compile(
+    r"^(?:" + "|".join(map(re.escape, sorted(_NON_IMAGE_MODELS))) + r")(?:-|$)"
+)
+_IMAGE_CAPABLE_RE = re.compile(
+    r"^(?:" + "|".join(map(re.escape, sorted(_IMAGE_CAPABLE_MODELS))) + r")(?:-|$)"
+)
+_MODEL_OPTIONS = (
     "gpt-4o-mini",
     "gpt-5-mini",
     "gpt-4o",
@@ -81,638 +110,26 @@ _MODEL_OPTIONS = [
     "o3-mini",
     "gpt-5",
     "gpt-5-nano",
-]
-_PROVIDER_OPTIONS = [
+)
+_PROVIDER_OPTIONS = (
     "openai",
     "custom1",
     "custom2",
     "custom3",
-]
+)
+_TRANSLATIONS_PATH = Path(__file__).resolve().parent / "translations.json"
+with open(_TRANSLATIONS_PATH, "rb") as _translations_file:
+    TRANSLATIONS = orjson.loads(_translations_file.read())
+# Freeze the translation tables: keys are interned once so lookups hit the
+# identity fast path, and the mappings are read-only.
 TRANSLATIONS = {
-    "en": {
-        "nav_back": "Back",
-        "nav_home": "Home",
-        "assignments_create": "Create Assignment",
-        "assignments_toggle_create": "Toggle Create Assignment",
-        "assignments_generate_title": "Generate Assignment",
-        "assignments_title": "Assignments",
-        "create_folder": "Create folder",
-        "assignment_generation_status": "Assignment generation",
-        "assignment_generation_running": "Running",
-        "assignment_generation_done": "Finished",
-        "assignment_generation_failed": "Failed",
-        "assignment_generation_view": "View",
-        "assignment_generation_busy": "Assignment generation is already running.",
-        "assignment_text": "Assignment Text",
-        "assignment_prompt_label": "Topic or instructions",
-        "assignment_prompt_placeholder": "e.g., Intro to derivatives, 20-minute quiz, include 3 problems.",
-        "generate_assignment": "Generate Assignment",
-        "folder": "Folder",
-        "folder_none": "No folder",
-        "folder_new": "New folder",
-        "folder_new_placeholder": "e.g., Calculus",
-        "folder_unassigned": "Unsorted",
-        "move": "Move",
-        "drag_to_move": "Drag to move",
-        "move_failed": "Unable to move assignment.",
-        "show_folder": "Show",
-        "hide_folder": "Hide",
-        "drag_hint": "Drag the hand icon to move assignments between folders.",
-        "folder_count_hint": "The number shows how many assignments are in the folder.",
-        "folder_move_hint": "Use the arrows to move the folder up or down.",
-        "rename_folder": "Rename",
-        "rename": "Rename",
-        "delete_folder": "Delete",
-        "delete_folder_hint": "Choose archive to hide assignments, or hard delete to remove them.",
-        "archive_folder": "Archive",
-        "unarchive_folder": "Unarchive",
-        "hard_delete_folder": "Hard delete",
-        "archive_folder_confirm": "Archive {count} assignments in this folder?",
-        "hard_delete_folder_confirm": "Permanently delete {count} assignments in this folder? This cannot be undone.",
-        "archived_folders": "Archived folders",
-        "archived_on": "Archived",
-        "folder_move_up": "Move folder up",
-        "folder_move_down": "Move folder down",
-        "show_archived_folders": "Show archived folders",
-        "hide_archived_folders": "Hide archived folders",
-        "open_folder": "Open folder",
-        "back_to_all_folders": "Back to all folders",
-        "viewing_folder": "Viewing folder",
-        "folder_empty_hint": (
-            "Folder is empty. Drag an assignment here, or create a new one with this folder selected."
-        ),
-        "title": "Title",
-        "create": "Create",
-        "created": "Created",
-        "open": "Open",
-        "delete": "Delete",
-        "no_assignments": "No assignments yet.",
-        "assignments_empty_hint": "Start by creating your first assignment below.",
-        "assignments_empty_steps": "To create an assignment, use the form above.",
-        "assignment_title_placeholder": "Example: Week 1 homework",
-        "assignment_text_placeholder": (
-            "Paste the problem statement here. You can include Markdown or LaTeX. "
-            "Example: How many seconds are there in a year?"
-        ),
-        "guide_text_placeholder": (
-            "Draft a grading guide: parts, points, and criteria.\n"
-            "Or choose provider and model to generate the draft and reference solution by LLM."
-        ),
-        "reference_solution_placeholder": (
-            "Write the ideal solution outline for each part.\n"
-            "Or choose provider and model to generate the draft and reference solution by LLM."
-        ),
-        "submission_text_placeholder": "Optional: add student text, clarifications, or notes.",
-        "grading_guides": "Grading Guides",
-        "guide_number": "Guide #",
-        "status": "Status",
-        "provider": "Provider",
-        "model": "Model",
-        "duration_s": "Duration (s)",
-        "price": "Price",
-        "preview": "Preview",
-        "actions": "Actions",
-        "view": "View",
-        "approve_guide": "Approve Guide",
-        "activate_guide": "Activate Guide",
-        "cancel": "Cancel",
-        "delete_guide": "Delete Guide",
-        "criteria_one_per_line": "Criteria (one per line)",
-        "add_part": "Add part",
-        "reference_line_hint": "One item per line. Use 'key: value' for labeled steps.",
-        "add_reference_part": "Add reference part",
-        "no_guides": "No grading guides yet.",
-        "guide_creation": "Grading Guide Creation",
-        "grading_templates": "Grading Templates",
-        "template_name": "Template name",
-        "save_template": "Save as template",
-        "use_template": "Use template",
-        "create_guide_from_template": "Load template into form",
-        "template_list": "Templates",
-        "edit_template": "Edit template",
-        "delete_template": "Delete template",
-        "delete_template_confirm": "Delete this template?",
-        "template_hint": "Use a saved grading guide template.",
-        "save_template_hint": "Provide a name to save this guide as a template.",
-        "toggle_templates": "Toggle templates",
-        "no_templates": "No templates yet.",
-        "toggle_guide_form": "Toggle Guide Form",
-        "create_guide_manual": "Create Grading Guide (Manual)",
-        "guide_text": "Grading Guide Text",
-        "reference_solution": "Reference Solution",
-        "save_draft": "Save Draft",
-        "generate_draft_guide": "Generate Draft Guide",
-        "choose_model_generation": "Choose model for generation",
-        "generate_draft_llm": "Generate Draft via LLM",
-        "formatted_output_label": "Formatted output (Markdown)",
-        "additional_instructions_label": "Additional instructions",
-        "additional_instructions_hint": "Optional: appended to the prompt for this run.",
-        "guide_empty_hint": "Start here -> Create a grading guide below.",
-        "guide_empty_note": "After the grading guide is ready, you can upload submissions.",
-        "upload_submissions": "Upload Submissions",
-        "toggle_uploads": "Toggle Uploads",
-        "approve_guide_enable": "Approve a grading guide to enable submissions.",
-        "submissions_desc": "Student uploads and feedback results show up here.",
-        "show_settings": "Show settings for",
-        "hide_settings": "Hide settings for",
-        "student_identifier": "Student Identifier (single upload)",
-        "model_optional": "Model (optional)",
-        "model_selection": "Model selection",
-        "submitted_text_optional": "Submitted Text (optional)",
-        "files_label": "Files (PDF, images, text)",
-        "drop_files_hint": "Drag and drop files here or click to browse.",
-        "files_hint": "Upload PDFs, images, or text files with the student solution.",
-        "zip_label": "Or ZIP with one file per student",
-        "drop_zip_hint": "Drag and drop a ZIP with one file per student, or click to browse.",
-        "zip_hint": "To speed things up, upload one ZIP with multiple students at once.",
-        "upload": "Upload",
-        "submissions": "Submissions",
-        "student": "Student",
-        "grade": "Grade",
-        "jobs_desc": "Background grading jobs and their progress.",
-        "no_submissions": "No submissions yet.",
-        "no_jobs": "No jobs yet.",
-        "export_csv": "Export CSV",
-        "jobs": "Jobs",
-        "submission_number": "Submission #",
-        "total_price_estimate": "Total Price Estimate (guides + jobs):",
-        "delete_assignment": "Delete Assignment",
-        "delete_assignment_prompt_title": "Delete assignment?",
-        "delete_assignment_prompt_body": (
-            "Choose Delete to remove the assignment and all related data, or Archive to hide it."
-        ),
-        "archive_assignment": "Archive",
-        "edit_assignment": "Edit Assignment",
-        "edit": "Edit",
-        "save_changes": "Save Changes",
-        "edit_guide": "Edit Grading Guide",
-        "submission": "Submission",
-        "assignment": "Assignment",
-        "submitted": "Submitted",
-        "submitted_text": "Submitted Text",
-        "no_submitted_text": "No submitted text.",
-        "files": "Files",
-        "no_files": "No files.",
-        "images": "Images",
-        "no_images": "No images rendered.",
-        "grade_result": "Grade Result",
-        "error": "Error",
-        "raw_llm_response": "Raw LLM Response",
-        "raw_json": "Raw JSON",
-        "no_grade_result": "No grade result yet.",
-        "job": "Job",
-        "student_hint": "Click the submission number to open details.",
-        "guide_version": "Guide Version",
-        "started": "Started",
-        "finished": "Finished",
-        "price_estimate": "Price Estimate",
-        "processing_summary": "Processing Summary",
-        "show_processing_summary": "Show Processing Summary",
-        "hide_processing_summary": "Hide Processing Summary",
-        "terminate_job": "Terminate Job",
-        "delete_job": "Delete Job",
-        "model_options": "Model options",
-        "rerun_job": "Rerun Job",
-        "rerun_guide": "Rerun Guide",
-        "raw_llm_response_error": "Raw LLM Response (Error)",
-        "settings": "Settings",
-        "settings_helper": "Edit values stored in .env. Some changes require a restart.",
-        "save_settings": "Save Settings",
-        "restart_required": "Restart required.",
-        "guide": "Grading Guide",
-        "approved_guide_in_use": "Approved guide in use.",
-        "guide_not_ready": "Guide is not ready to approve.",
-        "cancel_generation": "Cancel Generation",
-        "open_assignments": "Open Assignments",
-        "quick_start": "Quick Start",
-        "quick_start_brief": "Quick Start",
-        "why_sage": "Why SAGE",
-        "quick_start_walkthrough": "Quick Start Walkthrough",
-        "quick_start_cta_title": "Let’s start using the app!",
-        "quick_start_cta_desc": "Create your first assignment and see SAGE move from setup to feedback in minutes.",
-        "quick_start_cta_button": "Start creating assignments",
-        "top_bar_icons": "Top Bar Icons",
-        "responsible_use": "Responsible Use",
-        "why_sage1_title": "Automatic grading",
-        "why_sage1_text": "Use grading guides with part-level scoring and clear deductions.",
-        "why_sage2_title": "Flexible formats",
-        "why_sage2_text": "Support PDFs, images, and text, plus ZIP uploads for whole classes.",
-        "why_sage3_title": "Structured output",
-        "why_sage3_text": "Export all gradings for all students in a clean CSV table.",
-        "why_sage4_title": "Control over all steps",
-        "why_sage4_text": "All parts of the process are editable, end to end.",
-        "sage_home": "SAGE Home",
-        "language_currency": "Language",
-        "theme": "Theme",
-        "back_to_top": "Back to top",
-        "total_points": "Total points",
-        "max_points": "Max points",
-        "criteria": "Criteria",
-        "part_label": "Part",
-        "edit_grade": "Edit grading and feedback",
-        "update_grade": "Save feedback",
-        "grade_json": "Grade JSON",
-        "rendered_feedback": "Rendered feedback",
-        "total_points_override": "Total points",
-        "edit_grade_hint": (
-            "Edit the feedback text or total points."
-        ),
-        "delete_submission": "Delete Submission",
-        "delete_submission_confirm": "Delete this submission and all related data?",
-        "previous_image": "Previous image",
-        "next_image": "Next image",
-        "close": "Close",
-        "custom_model_label": "Custom model name",
-        "custom_model_placeholder": "Enter provider model name",
-        "other_model_option": "Other",
-        "provider_label": "Provider",
-        "provider_openai": "OpenAI",
-        "provider_other": "Other",
-        "show_guide": "Show grading guide",
-        "hide_guide": "Hide grading guide",
-        "show_reference_solution": "Show reference solution",
-        "hide_reference_solution": "Hide reference solution",
-        "no_guide_available": "No grading guide available.",
-        "show_assignment_text": "Show assignment text",
-        "hide_assignment_text": "Hide assignment text",
-        "hero_title": "Save time with automatic grading assistant.",
-        "sage_acronym": "Smart Automated Grading Engine",
-        "hero_subtitle": (
-            "A grading workspace for assignments, submissions, and AI-assisted feedback "
-            "that helps teachers move faster while staying in control."
-        ),
-        "hero_assignments_desc": "Manage assignments, grading guides, and submissions.",
-        "hero_quickstart_desc": "Jump to a step-by-step walkthrough below.",
-        "hero_chip_llm": "LLM-guided feedback",
-        "hero_chip_formats": "PDF + image + text",
-        "hero_chip_zip": "ZIP uploads supported",
-        "hero_chip_folders": "Folders for subjects",
-        "quick_step_1": "Create an assignment with the prompt or problem statement.",
-        "quick_step_2": "Create or generate a draft grading guide and approve it.",
-        "quick_step_3": "Upload submissions (PDFs, images, or text).",
-        "quick_step_4": "Review automated results and export grades.",
-        "topbar_home_desc": "Click the SAGE logo in the header to return here.",
-        "topbar_settings_desc": "Update API keys, model defaults, and limits.",
-        "topbar_language_desc": "Switch between English and Czech. Currency follows the language.",
-        "topbar_theme_desc": "Toggle light or dark mode.",
-        "step_label": "Step",
-        "alt_sage_logo": "SAGE logo",
-        "alt_settings_icon": "Settings icon",
-        "alt_flag_en": "English flag icon",
-        "alt_flag_cs": "Czech flag icon",
-        "alt_light_mode": "Light mode icon",
-        "alt_dark_mode": "Dark mode icon",
-        "walk_step1_title": "Step 1 — Create an assignment",
-        "walk_step1_desc": "Add the assignment title and problem statement to start a new grading run.",
-        "walk_step1a_title": "Step 1a — Example assignment",
-        "walk_step1a_desc": "Check a sample assignment layout to keep instructions consistent.",
-        "walk_step2_title": "Step 2 — Build a grading guide",
-        "walk_step2_desc": "Create a guide manually or generate a draft with the model, then approve it.",
-        "walk_step2a_title": "Step 2a — Guide examples",
-        "walk_step2a_desc": "See an example grading guide alongside the reference solution.",
-        "walk_step3_title": "Step 3 — Upload submissions",
-        "walk_step3_desc": "Upload PDFs, images, or text files. ZIPs with all students are supported.",
-        "walk_step4_title": "Step 4 — Review results",
-        "walk_step4_desc": "Inspect the feedback and export grades after instructor review.",
-        "walk_step4a_title": "Step 4a — Detailed submission view",
-        "walk_step4a_desc": "Open individual submissions to see detailed feedback and annotated results.",
-        "walk_alt_step1": "Create assignment screen",
-        "walk_alt_step1a": "Example assignment",
-        "walk_alt_step2": "Grading guide creation screen",
-        "walk_alt_step2a_guide": "Example grading guide",
-        "walk_alt_step2a_reference": "Example reference solution",
-        "walk_alt_step3": "Submission upload screen",
-        "walk_alt_step4": "Results and export screen",
-        "walk_alt_step4a_left": "Submission detail view",
-        "walk_alt_step4a_right": "Submission detail feedback",
-        "responsible_use_p1": (
-            "SAGE is intended to speed up grading and support teacher review. All grading guides, "
-            "outputs, and final grades must be verified by the instructor before release. "
-            "Do not issue grades based only on model output. Under the EU AI Act, automated grading "
-            "with AI tools is not allowed; a human must grade first and may then use AI to assist."
-        ),
-        "responsible_use_p2": (
-            "Confirm with students and your department, school, or university that this tool is permitted "
-            "for use. Student data is private and should be handled accordingly."
-        ),
-        "license_notice": "Licensed under Apache 2.0.",
-        "ideas_note": "Have ideas for improvement? Email ales.papacek@seznam.cz or open an issue on GitHub.",
-        "github_issues_link": "https://github.com/ampapacek/SAGE/issues",
-        "github_issues_label": "GitHub",
-    },
-    "cs": {
-        "nav_back": "Zpět",
-        "nav_home": "Domů",
-        "assignments_create": "Vytvořit úkol",
-        "assignments_toggle_create": "Zobrazit/skrýt formulář",
-        "assignments_generate_title": "Vygenerovat úkol",
-        "assignments_title": "Úkoly",
-        "create_folder": "Vytvořit složku",
-        "assignment_generation_status": "Generování úkolu",
-        "assignment_generation_running": "Probíhá",
-        "assignment_generation_done": "Dokončeno",
-        "assignment_generation_failed": "Chyba",
-        "assignment_generation_view": "Zobrazit",
-        "assignment_generation_busy": "Generování úkolu už běží.",
-        "assignment_text": "Text úkolu",
-        "assignment_prompt_label": "Téma nebo instrukce",
-        "assignment_prompt_placeholder": "např. Úvod do derivací, 20min test, 3 úlohy.",
-        "generate_assignment": "Vygenerovat úkol",
-        "folder": "Složka",
-        "folder_none": "Bez složky",
-        "folder_new": "Nová složka",
-        "folder_new_placeholder": "např. Matematika",
-        "folder_unassigned": "Nezařazené",
-        "move": "Přesunout",
-        "drag_to_move": "Přetáhněte pro přesun",
-        "move_failed": "Přesun se nezdařil.",
-        "show_folder": "Zobrazit",
-        "hide_folder": "Skrýt",
-        "drag_hint": "Přetáhněte ikonu ruky pro přesun mezi složkami.",
-        "folder_count_hint": "Cislo ukazuje pocet ukolu ve slozce.",
-        "folder_move_hint": "Sipky posouvaji slozku nahoru nebo dolu.",
-        "rename_folder": "Přejmenovat",
-        "rename": "Přejmenovat",
-        "delete_folder": "Smazat",
-        "delete_folder_hint": "Zvolte archivaci pro skrytí úkolů, nebo tvrdé smazání.",
-        "archive_folder": "Archivovat",
-        "unarchive_folder": "Obnovit",
-        "hard_delete_folder": "Trvale smazat",
-        "archive_folder_confirm": "Archivovat {count} úkolů v této složce?",
-        "hard_delete_folder_confirm": "Trvale smazat {count} úkolů v této složce? Nelze vrátit zpět.",
-        "archived_folders": "Archivované složky",
-        "archived_on": "Archivováno",
-        "folder_move_up": "Posunout složku nahoru",
-        "folder_move_down": "Posunout složku dolů",
-        "show_archived_folders": "Zobrazit archivované složky",
-        "hide_archived_folders": "Skrýt archivované složky",
-        "open_folder": "Otevřít složku",
-        "back_to_all_folders": "Zpět na všechny složky",
-        "viewing_folder": "Zobrazená složka",
-        "folder_empty_hint": (
-            "Složka je prázdná. Přetáhněte sem úkol, nebo vytvořte nový s touto složkou."
-        ),
-        "title": "Název",
-        "create": "Vytvořit",
-        "created": "Vytvořeno",
-        "open": "Otevřít",
-        "delete": "Smazat",
-        "no_assignments": "Zatím žádné úkoly.",
-        "assignments_empty_hint": "Začněte vytvořením prvního úkolu níže.",
-        "assignments_empty_steps": "Pro vytvoření úkolu použijte formulář výše.",
-        "assignment_title_placeholder": "Příklad: Úkol 1",
-        "assignment_text_placeholder": (
-            "Sem vložte text úkolu. Můžete použít Markdown nebo LaTeX. "
-            "Příklad: Kolik sekund je v roce?"
-        ),
-        "guide_text_placeholder": (
-            "Sepište kritéria hodnocení: části, body a kritéria.\n"
-            "Nebo vyberte poskytovatele a model pro generování konceptu a řešení přes LLM."
-        ),
-        "reference_solution_placeholder": (
-            "Napište vzorové řešení ke každé části.\n"
-            "Nebo vyberte poskytovatele a model pro generování konceptu a řešení přes LLM."
-        ),
-        "submission_text_placeholder": "Volitelně: přidejte text řešení, upřesnění nebo poznámky.",
-        "grading_guides": "Kritéria hodnocení",
-        "guide_number": "Kritéria #",
-        "status": "Stav",
-        "provider": "Poskytovatel",
-        "model": "Model",
-        "duration_s": "Délka (s)",
-        "price": "Cena",
-        "preview": "Náhled",
-        "actions": "Akce",
-        "view": "Zobrazit",
-        "approve_guide": "Schválit kritéria",
-        "activate_guide": "Aktivovat kritéria",
-        "cancel": "Zrušit",
-        "delete_guide": "Smazat kritéria",
-        "criteria_one_per_line": "Kritéria (jedno na řádek)",
-        "add_part": "Přidat část",
-        "reference_line_hint": "Jedna položka na řádek. Použijte 'klíč: hodnota' pro popisky.",
-        "add_reference_part": "Přidat část řešení",
-        "no_guides": "Zatím žádná kritéria hodnocení.",
-        "guide_creation": "Vytvoření kritérií hodnocení",
-        "grading_templates": "Šablony hodnocení",
-        "template_name": "Název šablony",
-        "save_template": "Uložit jako šablonu",
-        "use_template": "Použít šablonu",
-        "create_guide_from_template": "Načíst šablonu do formuláře",
-        "template_list": "Šablony",
-        "edit_template": "Upravit šablonu",
-        "delete_template": "Smazat šablonu",
-        "delete_template_confirm": "Smazat tuto šablonu?",
-        "template_hint": "Použijte uloženou šablonu kritérií hodnocení.",
-        "save_template_hint": "Zadejte název a uložte tato kritéria jako šablonu.",
-        "toggle_templates": "Zobrazit/skrýt šablony",
-        "no_templates": "Zatím žádné šablony.",
-        "toggle_guide_form": "Zobrazit/skrýt formulář",
-        "create_guide_manual": "Vytvořit kritéria hodnocení (ručně)",
-        "guide_text": "Text kritérií hodnocení",
-        "reference_solution": "Vzorové řešení",
-        "save_draft": "Uložit koncept",
-        "generate_draft_guide": "Vygenerovat koncept kritérií",
-        "choose_model_generation": "Vyberte model pro generování",
-        "generate_draft_llm": "Vygenerovat koncept přes LLM",
-        "formatted_output_label": "Formátovaný výstup (Markdown)",
-        "additional_instructions_label": "Doplňující instrukce",
-        "additional_instructions_hint": "Volitelné: přidá se do promptu pro tento běh.",
-        "guide_empty_hint": "Začněte zde → Vytvořte kritéria hodnocení níže.",
-        "guide_empty_note": "Po dokončení kritérií hodnocení můžete nahrát řešení.",
-        "upload_submissions": "Nahrát řešení",
-        "toggle_uploads": "Zobrazit/skrýt nahrávání",
-        "approve_guide_enable": "Schvalte kritéria hodnocení, aby bylo možné nahrávat řešení.",
-        "submissions_desc": "Zde se zobrazí nahraná řešení studentů a výsledná zpětná vazba.",
-        "show_settings": "Zobrazit nastavení pro",
-        "hide_settings": "Skrýt nastavení pro",
-        "student_identifier": "Identifikátor studenta (jednotlivě)",
-        "model_optional": "Model (volitelný)",
-        "model_selection": "Výběr modelu",
-        "submitted_text_optional": "Text řešení (volitelný)",
-        "files_label": "Soubory (PDF, obrázky, text)",
-        "drop_files_hint": "Přetáhněte soubory sem nebo klikněte pro výběr.",
-        "files_hint": "Nahrajte PDF, obrázky nebo textové soubory s řešením studenta.",
-        "zip_label": "Nebo ZIP s jedním souborem na studenta",
-        "drop_zip_hint": "Přetáhněte ZIP s jedním souborem na studenta, nebo klikněte pro výběr.",
-        "zip_hint": "Pro urychlení nahrajte jeden ZIP s více studenty najednou.",
-        "upload": "Nahrát",
-        "submissions": "Řešení",
-        "student": "Student",
-        "grade": "Body",
-        "jobs_desc": "Úlohy na pozadí a jejich aktuální stav.",
-        "no_submissions": "Zatím žádná řešení.",
-        "no_jobs": "Zatím žádné úlohy.",
-        "export_csv": "Export CSV",
-        "jobs": "Úlohy",
-        "submission_number": "Řešení #",
-        "total_price_estimate": "Celkový odhad ceny (průvodci + úlohy):",
-        "delete_assignment": "Smazat úkol",
-        "delete_assignment_prompt_title": "Smazat úkol?",
-        "delete_assignment_prompt_body": (
-            "Vyberte Smazat pro trvalé odstranění úkolu a všech dat, nebo Archivovat pro skrytí."
-        ),
-        "archive_assignment": "Archivovat",
-        "edit_assignment": "Upravit úkol",
-        "edit": "Upravit",
-        "save_changes": "Uložit změny",
-        "edit_guide": "Upravit kritéria hodnocení",
-        "submission": "Řešení",
-        "assignment": "Úkol",
-        "submitted": "Nahráno",
-        "submitted_text": "Text řešení",
-        "no_submitted_text": "Žádný text řešení.",
-        "files": "Soubory",
-        "no_files": "Žádné soubory.",
-        "images": "Obrázky",
-        "no_images": "Žádné obrázky.",
-        "grade_result": "Výsledek hodnocení",
-        "error": "Chyba",
-        "raw_llm_response": "Surová odpověď LLM",
-        "raw_json": "Surový JSON",
-        "no_grade_result": "Zatím žádný výsledek.",
-        "job": "Úloha",
-        "student_hint": "Kliknutím na číslo řešení otevřete detail.",
-        "guide_version": "Verze kritérií",
-        "started": "Spuštěno",
-        "finished": "Dokončeno",
-        "price_estimate": "Odhad ceny",
-        "processing_summary": "Souhrn zpracování",
-        "show_processing_summary": "Zobrazit souhrn",
-        "hide_processing_summary": "Skrýt souhrn",
-        "terminate_job": "Ukončit úlohu",
-        "delete_job": "Smazat úlohu",
-        "model_options": "Možnosti modelu",
-        "rerun_job": "Spustit znovu",
-        "rerun_guide": "Zkusit znovu",
-        "raw_llm_response_error": "Surová odpověď LLM (chyba)",
-        "settings": "Nastavení",
-        "settings_helper": "Upravte hodnoty v .env. Některé změny vyžadují restart.",
-        "save_settings": "Uložit nastavení",
-        "restart_required": "Vyžaduje restart.",
-        "guide": "Kritéria hodnocení",
-        "approved_guide_in_use": "Schválená kritéria jsou aktivní.",
-        "guide_not_ready": "Kritéria nejsou připravena ke schválení.",
-        "cancel_generation": "Zrušit generování",
-        "open_assignments": "Spravovat úkoly",
-        "quick_start": "Návod krok za krokem",
-        "quick_start_brief": "Rychlý přehled",
-        "why_sage": "Proč SAGE",
-        "quick_start_walkthrough": "Návod krok za krokem",
-        "quick_start_cta_title": "Pojďme začít s aplikací!",
-        "quick_start_cta_desc": "Vytvořte první úkol, nahrajte řešení a sledujte, jak vám SAGE pomůže s vaší prací.",
-        "quick_start_cta_button": "Začít vytvářet úkoly",
-        "top_bar_icons": "Ikony v horní liště",
-        "responsible_use": "Důležité upozornění",
-        "why_sage1_title": "Automatické hodnocení",
-        "why_sage1_text": "Hodnocení, které se drží vytyčených kritérií.",
-        "why_sage2_title": "Flexibilní formáty",
-        "why_sage2_text": "Podpora PDF, obrázků i textu, včetně možnosti nahrání ZIP souboru s řešením několika studentů.",
-        "why_sage3_title": "Strukturované výstupy",
-        "why_sage3_text": "Export všech hodnocení všech studentů do přehledné tabulky CSV.",
-        "why_sage4_title": "Kontrola nad všemi kroky",
-        "why_sage4_text": "Všechny části procesu jsou upravitelné od začátku do konce.",
-        "sage_home": "SAGE domů",
-        "language_currency": "Jazyk",
-        "theme": "Motiv",
-        "back_to_top": "Zpět nahoru",
-        "total_points": "Celkem bodů",
-        "max_points": "Max. bodů",
-        "criteria": "Kritéria",
-        "part_label": "Část",
-        "edit_grade": "Upravit hodnocení a zpětnou vazbu",
-        "update_grade": "Uložit zpětnou vazbu",
-        "grade_json": "JSON hodnocení",
-        "rendered_feedback": "Zobrazená zpětná vazba",
-        "total_points_override": "Celkem bodů",
-        "edit_grade_hint": (
-            "Upravte text zpětné vazby nebo celkové body."
-        ),
-        "delete_submission": "Smazat řešení",
-        "delete_submission_confirm": "Smazat toto řešení a všechna související data?",
-        "previous_image": "Předchozí obrázek",
-        "next_image": "Další obrázek",
-        "close": "Zavřít",
-        "custom_model_label": "Vlastní název modelu",
-        "custom_model_placeholder": "Zadejte název modelu poskytovatele",
-        "other_model_option": "Jiný",
-        "provider_label": "Poskytovatel",
-        "provider_openai": "OpenAI",
-        "provider_other": "Jiný",
-        "show_guide": "Zobrazit kritéria hodnocení",
-        "hide_guide": "Skrýt kritéria hodnocení",
-        "show_reference_solution": "Zobrazit referenční řešení",
-        "hide_reference_solution": "Skrýt referenční řešení",
-        "no_guide_available": "Žádná kritéria hodnocení nejsou k dispozici.",
-        "show_assignment_text": "Zobrazit text úkolu",
-        "hide_assignment_text": "Skrýt text úkolu",
-        "hero_title": "Ušetřete čas s automatickým asistentem na hodnocení úkolů.",
-        "sage_acronym": "Smart Automated Grading Engine",
-        "hero_subtitle": (
-            "Pracovní prostor pro úkoly, řešení a automatické hodnocení pomocí AI. "
-            "Vše pro pomoc učitelům postupovat rychleji a přitom mít vše pod kontrolou."
-        ),
-        "hero_assignments_desc": "Vytvořte nové úkoly, prohlížejte všechny vytvořené úkoly.",
-        "hero_quickstart_desc": "Přejděte na návod níže.",
-        "hero_chip_llm": "LLM zpětná vazba",
-        "hero_chip_formats": "PDF + obrázky + text",
-        "hero_chip_zip": "Podpora ZIP nahrávek",
-        "hero_chip_folders": "Složky pro předměty",
-        "quick_step_1": "Vytvořte nový úkol se zadáním úlohy.",
-        "quick_step_2": "Vytvořte nebo vygenerujte koncept kritérií a schvalte jej.",
-        "quick_step_3": "Nahrajte řešení (PDF, obrázky nebo text).",
-        "quick_step_4": "Zkontrolujte automatické obodování a zpětnou vazbu. Výsledky můžete exportovat do přehledné tabulky (CSV).",
-        "topbar_home_desc": "Klikněte na logo SAGE v horní liště a vraťte se sem.",
-        "topbar_settings_desc": "Upravte API klíče, výchozí modely a limity.",
-        "topbar_language_desc": "Přepněte mezi angličtinou a češtinou. Měna se řídí jazykem.",
-        "topbar_theme_desc": "Přepněte světlý nebo tmavý režim.",
-        "step_label": "Krok",
-        "alt_sage_logo": "Logo SAGE",
-        "alt_settings_icon": "Ikona nastavení",
-        "alt_flag_en": "Ikona anglické vlajky",
-        "alt_flag_cs": "Ikona české vlajky",
-        "alt_light_mode": "Ikona světlého režimu",
-        "alt_dark_mode": "Ikona tmavého režimu",
-        "walk_step1_title": "Krok 1 — Vytvořte úkol",
-        "walk_step1_desc": "Přidejte název úkolu a zadání úlohy pro zahájení hodnocení.",
-        "walk_step1a_title": "Krok 1a — Ukázkový úkol",
-        "walk_step1a_desc": "Ukázka zadání úkolu",
-        "walk_step2_title": "Krok 2 — Sestavte kritéria hodnocení",
-        "walk_step2_desc": "Vytvořte kritéria ručně nebo vygenerujte koncept a schvalte jej.",
-        "walk_step2a_title": "Krok 2a — Ukázky kritérií",
-        "walk_step2a_desc": "Podívejte se na ukázku kritérií vedle vzorového řešení.",
-        "walk_step3_title": "Krok 3 — Nahrajte řešení",
-        "walk_step3_desc": "Nahrajte PDF, obrázky nebo text. ZIP s více studenty je podporován.",
-        "walk_step4_title": "Krok 4 — Zkontrolujte výsledky",
-        "walk_step4_desc": "Zkontrolujte automatické obodování a zpětnou vazbu. Výsledky lze exportovat do přehledné tabulky (CSV).",
-        "walk_step4a_title": "Krok 4a — Detail řešení",
-        "walk_step4a_desc": "Otevřete detailní řešení s komentovanou zpětnou vazbou.",
-        "walk_alt_step1": "Obrazovka vytvoření úkolu",
-        "walk_alt_step1a": "Ukázkový úkol",
-        "walk_alt_step2": "Obrazovka tvorby kritérií",
-        "walk_alt_step2a_guide": "Ukázka kritérií hodnocení",
-        "walk_alt_step2a_reference": "Ukázka referenčního řešení",
-        "walk_alt_step3": "Obrazovka nahrání řešení",
-        "walk_alt_step4": "Obrazovka výsledků a exportu",
-        "walk_alt_step4a_left": "Detail řešení",
-        "walk_alt_step4a_right": "Zpětná vazba k řešení",
-        "responsible_use_p1": (
-            "SAGE má urychlit hodnocení a podpořit kontrolu učitele. Všechna kritéria, "
-            "výstupy i finální známky musí být před zveřejněním ověřeny instruktorem. "
-            "Nevydávejte známky pouze na základě výstupu modelu. Dle AI Act nesmíte automaticky "
-            "hodnotit studenty pomocí AI nástrojů; nejdřív musí hodnotit člověk a následně si může "
-            "pomoci AI nástrojem."
-        ),
-        "responsible_use_p2": (
-            "Ověřte se studenty a vedením katedry, školy či univerzity, že je tento nástroj "
-            "povolený k použití. Studentská data jsou soukromá a je nutné s nimi tak zacházet."
-        ),
-        "license_notice": "Licencováno pod Apache 2.0.",
-        "ideas_note": "Máte nápad na zlepšení? Napište na ales.papacek@seznam.cz nebo založte issue na GitHubu.",
-        "github_issues_link": "https://github.com/ampapacek/SAGE/issues",
-        "github_issues_label": "GitHubu",
-    },
+    lang: types.MappingProxyType(
+        {sys.intern(key): value for key, value in table.items()}
+    )
+    for lang, table in TRANSLATIONS.items()
 }
+_T_EN_GET = TRANSLATIONS["en"].get
+_T_CS_GET = TRANSLATIONS["cs"].get
 _SETTINGS_FIELDS = [
     {
         "key": "SECRET_KEY",
@@ -963,36 +380,108 @@ _SETTINGS_FIELDS = [
     },
 ]
 
-_ALLOWED_TAGS = [
-    "p",
-    "br",
-    "strong",
-    "em",
-    "code",
-    "pre",
-    "ul",
-    "ol",
-    "li",
-    "blockquote",
-    "h1",
-    "h2",
-    "h3",
-    "h4",
-    "h5",
-    "h6",
-    "table",
-    "thead",
-    "tbody",
-    "tr",
-    "th",
-    "td",
-    "hr",
-    "a",
-]
+def _provider_group_for_key(key):
+    prefix = "CUSTOM_LLM_PROVIDER_"
+    if key.startswith(prefix) and key[len(prefix) : len(prefix) + 1] in {"1", "2", "3"}:
+        return key[len(prefix)]
+    return None
+
+
+def _to_bool_setting(value):
+    return value.lower() in {"1", "true", "yes", "on"}
+
+
+# Maps typed settings to their coercer; everything else stays a string.
+_SETTING_COERCERS = {
+    "LLM_USE_JSON_MODE": _to_bool_setting,
+    "LLM_FORMATTED_OUTPUT": _to_bool_setting,
+    "SHOW_COSTS": _to_bool_setting,
+    "LLM_MAX_OUTPUT_TOKENS": int,
+    "LLM_REQUEST_TIMEOUT": int,
+    "LLM_IMAGE_TOKENS_PER_IMAGE": int,
+    "MAX_CONTENT_LENGTH": int,
+    "PDF_DPI": int,
+    "PDF_TEXT_MIN_CHARS": int,
+    "LLM_PRICE_INPUT_PER_1K": float,
+    "LLM_PRICE_OUTPUT_PER_1K": float,
+    "PDF_TEXT_MIN_RATIO": float,
+}
+
+
+_OTHER_PROVIDER_LABELS = {"1": "Other 1", "2": "Other 2", "3": "Other 3"}
+
+
+def _clean_setting_value(value):
+    return (value or "").strip().strip('"')
+
+
+def _has_provider_info(field_values, index):
+    name = _clean_setting_value(field_values.get(f"CUSTOM_LLM_PROVIDER_{index}_NAME"))
+    if name and name != _OTHER_PROVIDER_LABELS[index]:
+        return True
+    for suffix in ("API_KEY", "API_BASE_URL", "DEFAULT_MODEL", "MODELS"):
+        if _clean_setting_value(
+            field_values.get(f"CUSTOM_LLM_PROVIDER_{index}_{suffix}")
+        ):
+            return True
+    return False
+
+
+for _field in _SETTINGS_FIELDS:
+    _field["key"] = sys.intern(_field["key"])
+    _field["provider_group"] = _provider_group_for_key(_field["key"])
+
+# O(1) metadata lookup by key; checkbox keys need explicit handling because
+# unchecked boxes are absent from the posted form.
+_SETTINGS_FIELD_BY_KEY = {field["key"]: field for field in _SETTINGS_FIELDS}
+_CHECKBOX_KEYS = tuple(
+    field["key"] for field in _SETTINGS_FIELDS if field.get("type") == "checkbox"
+)
+
+_ALLOWED_TAGS = frozenset(
+    (
+        "p",
+        "br",
+        "strong",
+        "em",
+        "code",
+        "pre",
+        "ul",
+        "ol",
+        "li",
+        "blockquote",
+        "h1",
+        "h2",
+        "h3",
+        "h4",
+        "h5",
+        "h6",
+        "table",
+        "thead",
+        "tbody",
+        "tr",
+        "th",
+        "td",
+        "hr",
+        "a",
+    )
+)
 _ALLOWED_ATTRIBUTES = {
-    "a": ["href", "title", "rel", "target"],
+    "a": {"href", "title", "rel", "target"},
 }
 
+_MATH_DISPLAY_RE = re.compile(r"\$\$(.+?)\$\$", re.DOTALL)
+_MATH_INLINE_RE = re.compile(r"\$(.+?)\$")
+
+# Rust-backed markdown parser shared across requests; the enabled plugins
+# mirror the old python-markdown extensions (tables, fenced code, autolinks).
+_MARKDOWN = MarkdownIt("commonmark").enable_many(
+    ["table", "strikethrough", "autolink_ext"]
+)
+# Build the sanitizer once; nh3.Cleaner precompiles the tag/attribute policy
+# and is safe to share across threads.
+_CLEANER = nh3.Cleaner(tags=_ALLOWED_TAGS, attributes=_ALLOWED_ATTRIBUTES, link_rel=None)
+
 
 def _utcnow():
     return datetime.now(timezone.utc)
@@ -1006,77 +495,155 @@ def _as_utc(value):
     return value.astimezone(timezone.utc)
 
 
+class OrjsonProvider(DefaultJSONProvider):
+    """Route Flask's jsonify through orjson."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=str).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+class _Echo:
+    """Write-through buffer so csv.writer output can be yielded directly."""
+
+    def write(self, value):
+        return value
+
+
+def _json_response(payload):
+    # orjson serializes datetimes natively and is much faster than jsonify.
+    return Response(orjson.dumps(payload, default=str), mimetype="application/json")
+
+
+def _get_or_404(model, pk):
+    obj = db.session.get(model, pk)
+    if obj is None:
+        abort(404)
+    return obj
+
+
+def _rubric_duration_seconds(rubric, now):
+    if rubric.finished_at:
+        finished_at = _as_utc(rubric.finished_at)
+        created_at = _as_utc(rubric.created_at)
+        if finished_at and created_at:
+            return (finished_at - created_at).total_seconds()
+        return None
+    if rubric.status == RubricStatus.GENERATING:
+        created_at = _as_utc(rubric.created_at)
+        if created_at:
+            return (now - created_at).total_seconds()
+    return None
+
+
+@functools.cache
 def _ensure_data_dirs():
     for path in (DATA_DIR, UPLOAD_DIR, PROCESSED_DIR):
         path.mkdir(parents=True, exist_ok=True)
 
 
 def _extract_price_estimate(message):
+    # The marker is a literal prefix, so a find + numeric slice beats a
+    # regex search over large job logs.
     if not message:
         return None
-    match = _PRICE_ESTIMATE_RE.search(message)
-    if not match:
+    start = message.find(_PRICE_ESTIMATE_PREFIX)
+    if start < 0:
+        return None
+    start += len(_PRICE_ESTIMATE_PREFIX)
+    end = start
+    while end < len(message) and (message[end].isdigit() or message[end] == "."):
+        end += 1
+    if end == start:
         return None
     try:
-        return float(match.group(1))
+        return float(message[start:end])
     except ValueError:
         return None
 
 
+_ENV_FILE_PATH = Path(__file__).resolve().parent / ".env"
+_DATA_DIR_PREFIX = str(DATA_DIR) + os.sep
+
+
 def _env_file_path():
-    return Path(__file__).resolve().parent / ".env"
+    return _ENV_FILE_PATH
 
 
 def _load_env_lines():
-    env_path = _env_file_path()
-    if not env_path.exists():
+    try:
+        raw = _env_file_path().read_bytes()
+    except FileNotFoundError:
         return []
-    return env_path.read_text().splitlines()
+    return raw.decode("utf-8", "replace").splitlines()
+
+
+_needs_env_quotes = re.compile(r"[ #=\"']").search
 
 
 def _format_env_value(value):
     if value is None:
         return ""
     value = str(value)
-    if any(ch in value for ch in [" ", "#", "=", '"', "'"]):
+    if _needs_env_quotes(value):
         escaped = value.replace('"', '\\"')
         return f"\"{escaped}\""
     return value
 
 
+_ENV_LINE_RE = re.compile(r"^\s*([A-Za-z_][A-Za-z0-9_]*)\s*=")
+
+
 def _update_env_file(values):
-    lines = _load_env_lines()
-    if not lines:
-        lines = []
-    keys = set(values.keys())
-    seen = set()
-    updated_lines = []
-    for line in lines:
-        stripped = line.strip()
-        if not stripped or stripped.startswith("#") or "=" not in line:
-            updated_lines.append(line)
-            continue
-        key, _rest = line.split("=", 1)
-        key = key.strip()
-        if key in keys:
-            updated_lines.append(f"{key}={_format_env_value(values[key])}")
-            seen.add(key)
-        else:
-            updated_lines.append(line)
-    for key in keys:
-        if key not in seen:
-            updated_lines.append(f"{key}={_format_env_value(values[key])}")
-    _env_file_path().write_text("\n".join(updated_lines).rstrip() + "\n")
+    # The advisory lock must cover the read as well as the rewrite:
+    # otherwise two concurrent saves read the same original file and the
+    # second os.replace discards the first save's keys.
+    env_path = _env_file_path()
+    lock_path = env_path.with_name(env_path.name + ".lock")
+    with open(lock_path, "w") as lock_handle:
+        if fcntl is not None:
+            fcntl.flock(lock_handle, fcntl.LOCK_EX)
+        remaining = dict(values)
+        updated_lines = _load_env_lines()
+        for index, line in enumerate(updated_lines):
+            match = _ENV_LINE_RE.match(line)
+            if match is None:
+                continue
+            key = match.group(1)
+            if key in values:
+                updated_lines[index] = f"{key}={_format_env_value(values[key])}"
+                remaining.pop(key, None)
+        for key, value in remaining.items():
+            updated_lines.append(f"{key}={_format_env_value(value)}")
+        _write_env_file("\n".join(updated_lines).rstrip() + "\n")
+
+
+def _write_env_file(content):
+    # Write the whole file in one buffered pass and swap it in atomically so
+    # a crash mid-save cannot leave a truncated .env behind. Callers hold
+    # the .env lock across their read-rewrite-replace sequence.
+    env_path = _env_file_path()
+    tmp_path = env_path.with_name(env_path.name + ".tmp")
+    with open(tmp_path, "wb", buffering=1 << 16) as handle:
+        handle.write(content.encode("utf-8"))
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_path, env_path)
 
 
 def _current_setting_value(app, key):
-    if key in os.environ:
-        return os.environ.get(key, "")
+    value = os.environ.get(key)
+    if value is not None:
+        return value
     value = app.config.get(key)
     if value is None:
         return ""
-    if isinstance(value, bool):
-        return "1" if value else "0"
+    if value is True:
+        return "1"
+    if value is False:
+        return "0"
     return str(value)
 
 
@@ -1088,22 +655,55 @@ def _get_locale():
 
 
 def t(key):
-    locale = getattr(g, "locale", "en")
-    return TRANSLATIONS.get(locale, TRANSLATIONS["en"]).get(key, key)
+    translate = getattr(g, "translate", _T_EN_GET)
+    return translate(key, key)
 
 
 def _format_points(value):
+    # Dispatch on type first so the common numeric cases skip the
+    # exception-guarded float() conversion entirely.
     if value is None:
         return "--"
-    try:
-        numeric = float(value)
-    except (TypeError, ValueError):
+    if type(value) is int:
         return str(value)
+    if type(value) is float:
+        numeric = value
+    else:
+        try:
+            numeric = float(value)
+        except (TypeError, ValueError):
+            return str(value)
     if numeric.is_integer():
         return str(int(numeric))
     return f"{numeric:.2f}".rstrip("0").rstrip(".")
 
 
+@functools.lru_cache(maxsize=1024)
+def _grade_display(json_result, fallback_points):
+    # Content-keyed so edited grades miss the cache automatically.
+    data, _error = safe_json_loads(json_result) if json_result else (None, "")
+    if not data:
+        return _format_points(fallback_points)
+    parts = data.get("parts", [])
+    total_possible = 0.0
+    has_possible = False
+    for part in parts:
+        value = part.get("points_possible") if isinstance(part, dict) else None
+        if isinstance(value, (int, float)):
+            total_possible += value
+            has_possible = True
+        elif value is not None:
+            try:
+                total_possible += float(value)
+                has_possible = True
+            except (TypeError, ValueError):
+                pass
+    total_points = data.get("total_points", fallback_points)
+    if has_possible:
+        return f"{_format_points(total_points)}/{_format_points(total_possible)}"
+    return _format_points(total_points)
+
+
 def _normalize_folder_name(value):
     return (value or "").strip()
 
@@ -1266,7 +866,7 @@ def _build_folder_groups(assignments, include_unassigned, unassigned_label, arch
 
 def _extract_math_blocks(text):
     placeholders = {}
-    if not text:
+    if not text or "$" not in text:
         return text, placeholders
 
     def replace_display(match):
@@ -1281,27 +881,39 @@ def _extract_math_blocks(text):
         placeholders[key] = f"${content}$"
         return key
 
-    text = re.sub(r"\$\$(.+?)\$\$", replace_display, text, flags=re.DOTALL)
-    text = re.sub(r"\$(.+?)\$", replace_inline, text)
+    text = _MATH_DISPLAY_RE.sub(replace_display, text)
+    text = _MATH_INLINE_RE.sub(replace_inline, text)
     return text, placeholders
 
 
+_RENDER_CACHE_MAX_CHARS = 1 << 16
+
+
 def _render_markdown(text):
-    if not text:
+    if not text or not text.strip():
         return ""
+    # Oversized texts are rendered uncached so the LRU cannot pin megabytes
+    # of HTML; everything else is memoized per source string.
+    if len(text) > _RENDER_CACHE_MAX_CHARS:
+        return _render_markdown_impl(text)
+    return _render_markdown_cached(text)
+
+
+@functools.lru_cache(maxsize=2048)
+def _render_markdown_cached(text):
+    return _render_markdown_impl(text)
+
+
+def _render_markdown_impl(text):
     prepared, placeholders = _extract_math_blocks(text)
-    rendered = markdown.markdown(
-        prepared,
-        extensions=["extra", "tables", "fenced_code", "sane_lists"],
-        output_format="html5",
-    )
-    cleaned = bleach.clean(
-        rendered, tags=_ALLOWED_TAGS, attributes=_ALLOWED_ATTRIBUTES, strip=True
-    )
-    cleaned = bleach.linkify(cleaned)
-    for key, value in placeholders.items():
-        cleaned = cleaned.replace(key, value)
-    return cleaned
+    rendered = _MARKDOWN.render(prepared)
+    cleaned = _CLEANER.clean(rendered)
+    if placeholders:
+        # One combined pass instead of a full rescan per placeholder.
+        pattern = re.compile("|".join(map(re.escape, placeholders)))
+        cleaned = pattern.sub(lambda match: placeholders[match.group(0)], cleaned)
+    # The cached value is already sanitized, so hand Jinja a SafeString.
+    return Markup(cleaned)
 
 
 def _render_markdown_fragment(value):
@@ -1310,6 +922,23 @@ def _render_markdown_fragment(value):
     return _render_markdown(str(value))
 
 
+@functools.lru_cache(maxsize=512)
+def _parsed_rubric_structured(rubric_text):
+    # Rubric text is immutable once approved; key the parse on the content.
+    structured, _error = safe_json_loads(rubric_text)
+    if isinstance(structured, dict) and structured.get("parts"):
+        return structured
+    return None
+
+
+@functools.lru_cache(maxsize=512)
+def _parsed_reference_structured(reference_text):
+    structured, _error = safe_json_loads(reference_text)
+    if isinstance(structured, dict):
+        return structured
+    return None
+
+
 def _render_rubric_structured_markdown(structured):
     if not isinstance(structured, dict):
         return structured
@@ -1377,7 +1006,32 @@ def _render_reference_structured_markdown(structured):
     return rendered
 
 
+def _preview_parts_from_dict(parts, max_parts):
+    preview_parts = [
+        _extract_preview_part(str(part_id), part)
+        for part_id, part in list(parts.items())[:max_parts]
+    ]
+    return preview_parts, len(parts)
+
+
+def _preview_parts_from_list(parts, max_parts):
+    preview_parts = []
+    for index, part in enumerate(parts[:max_parts], start=1):
+        part_id = part.get("part_id") if isinstance(part, dict) else None
+        preview_parts.append(_extract_preview_part(str(part_id or index), part))
+    return preview_parts, len(parts)
+
+
+_PREVIEW_PART_WALKERS = {
+    dict: _preview_parts_from_dict,
+    list: _preview_parts_from_list,
+}
+
+
+@functools.lru_cache(maxsize=512)
 def _build_guide_preview(rubric_text, max_parts=1, max_words=12):
+    # Keyed on the rubric text itself, so edits naturally miss the cache;
+    # callers treat the returned preview dict as read-only.
     preview = {
         "total_points": None,
         "parts": None,
@@ -1390,25 +1044,11 @@ def _build_guide_preview(rubric_text, max_parts=1, max_words=12):
     if isinstance(structured, dict):
         parts = structured.get("parts")
         if parts:
-            preview_parts = []
-            if isinstance(parts, dict):
-                items = list(parts.items())
-                total_parts = len(items)
-                for part_id, part in items[:max_parts]:
-                    preview_parts.append(
-                        _extract_preview_part(str(part_id), part)
-                    )
-            elif isinstance(parts, list):
-                total_parts = len(parts)
-                for index, part in enumerate(parts[:max_parts], start=1):
-                    part_id = None
-                    if isinstance(part, dict):
-                        part_id = part.get("part_id")
-                    preview_parts.append(
-                        _extract_preview_part(str(part_id or index), part)
-                    )
+            walker = _PREVIEW_PART_WALKERS.get(type(parts))
+            if walker:
+                preview_parts, total_parts = walker(parts, max_parts)
             else:
-                total_parts = 0
+                preview_parts, total_parts = [], 0
             if preview_parts:
                 preview["total_points"] = structured.get("total_points")
                 preview["parts"] = preview_parts
@@ -1580,16 +1220,18 @@ def _parse_reference_editor(form):
     return parts, None
 
 
+@functools.lru_cache(maxsize=256)
 def _model_supports_images(model_name):
     if not model_name:
         return True
     name = model_name.strip().lower()
-    for model in _NON_IMAGE_MODELS:
-        if name == model or name.startswith(f"{model}-"):
-            return False
-    for model in _IMAGE_CAPABLE_MODELS:
-        if name == model or name.startswith(f"{model}-"):
-            return True
+    capability = _MODEL_IMAGE_CAP.get(name)
+    if capability is not None:
+        return capability
+    if _NON_IMAGE_RE.match(name):
+        return False
+    if _IMAGE_CAPABLE_RE.match(name):
+        return True
     return True
 
 
@@ -1625,7 +1267,13 @@ def _resolve_extra_instructions(form):
     return (form.get("extra_instructions") or "").strip()
 
 
+@functools.lru_cache(maxsize=64)
 def _provider_config(provider_key):
+    # Returns a read-only mapping so the cached value cannot be mutated.
+    return types.MappingProxyType(_build_provider_config(provider_key))
+
+
+def _build_provider_config(provider_key):
     provider_key = _normalize_provider_key(provider_key)
     if provider_key == "custom1":
         return {
@@ -1665,6 +1313,7 @@ def _provider_default_models():
     }
 
 
+@functools.lru_cache(maxsize=64)
 def _provider_display(provider_key):
     provider_key = _normalize_provider_key(provider_key)
     if provider_key == "custom1":
@@ -1676,6 +1325,7 @@ def _provider_display(provider_key):
     return "OpenAI"
 
 
+@functools.lru_cache(maxsize=64)
 def _normalize_provider_key(provider_key):
     if not provider_key:
         return "openai"
@@ -1685,6 +1335,14 @@ def _normalize_provider_key(provider_key):
 
 
 def _provider_option_items(include_unconfigured=False):
+    # Keyed on the locale because the OpenAI label goes through t().
+    return _provider_option_items_cached(
+        getattr(g, "locale", "en"), include_unconfigured
+    )
+
+
+@functools.lru_cache(maxsize=8)
+def _provider_option_items_cached(_locale, include_unconfigured):
     options = [{"value": "openai", "label": t("provider_openai")}]
 
     def add_custom(value, name, base_url, fallback):
@@ -1712,8 +1370,8 @@ def _provider_option_items(include_unconfigured=False):
     return options
 
 
-def _resolve_default_provider(preferred, provider_options):
-    values = [option["value"] for option in provider_options]
+@functools.lru_cache(maxsize=64)
+def _resolve_default_provider_cached(preferred, values):
     if preferred in values:
         return preferred
     if "openai" in values:
@@ -1721,43 +1379,53 @@ def _resolve_default_provider(preferred, provider_options):
     return values[0] if values else "openai"
 
 
+def _resolve_default_provider(preferred, provider_options):
+    values = tuple(option["value"] for option in provider_options)
+    return _resolve_default_provider_cached(preferred, values)
+
+
 def _parse_model_options(raw, fallback):
+    return _parse_model_options_cached(raw, tuple(fallback))
+
+
+@functools.lru_cache(maxsize=32)
+def _parse_model_options_cached(raw, fallback):
     if raw is None:
-        return list(fallback)
-    items = [item.strip() for item in raw.split(",") if item.strip()]
-    return items or list(fallback)
+        return fallback
+    items = tuple(item.strip() for item in raw.split(",") if item.strip())
+    return items or fallback
 
 
 def _build_model_option_items(model_list, include_supports_images=True):
-    items = []
-    seen = set()
-    for model in model_list:
-        if not model:
-            continue
-        key = model.strip()
-        if not key or key.lower() == "other" or key in seen:
-            continue
-        seen.add(key)
-        item = {"value": key}
-        if include_supports_images:
-            item["supports_images"] = _model_supports_images(key)
-        items.append(item)
-    return items
+    # dict.fromkeys dedupes in C while preserving order.
+    cleaned = dict.fromkeys(
+        stripped
+        for model in model_list
+        if model and (stripped := model.strip()) and stripped.lower() != "other"
+    )
+    if include_supports_images:
+        return [
+            {"value": key, "supports_images": _model_supports_images(key)}
+            for key in cleaned
+        ]
+    return [{"value": key} for key in cleaned]
 
 
+@functools.lru_cache(maxsize=1)
 def _provider_model_option_items():
+    # Pure function of Config, which is fixed after boot; build once.
     openai_models = _parse_model_options(Config.OPENAI_MODEL_OPTIONS, _MODEL_OPTIONS)
     if Config.LLM_MODEL and Config.LLM_MODEL not in openai_models:
-        openai_models = [Config.LLM_MODEL] + openai_models
+        openai_models = (Config.LLM_MODEL,) + tuple(openai_models)
     custom1_models = _parse_model_options(Config.CUSTOM_LLM_PROVIDER_1_MODELS, [])
     if Config.CUSTOM_LLM_PROVIDER_1_DEFAULT_MODEL and Config.CUSTOM_LLM_PROVIDER_1_DEFAULT_MODEL not in custom1_models:
-        custom1_models = [Config.CUSTOM_LLM_PROVIDER_1_DEFAULT_MODEL] + custom1_models
+        custom1_models = (Config.CUSTOM_LLM_PROVIDER_1_DEFAULT_MODEL,) + tuple(custom1_models)
     custom2_models = _parse_model_options(Config.CUSTOM_LLM_PROVIDER_2_MODELS, [])
     if Config.CUSTOM_LLM_PROVIDER_2_DEFAULT_MODEL and Config.CUSTOM_LLM_PROVIDER_2_DEFAULT_MODEL not in custom2_models:
-        custom2_models = [Config.CUSTOM_LLM_PROVIDER_2_DEFAULT_MODEL] + custom2_models
+        custom2_models = (Config.CUSTOM_LLM_PROVIDER_2_DEFAULT_MODEL,) + tuple(custom2_models)
     custom3_models = _parse_model_options(Config.CUSTOM_LLM_PROVIDER_3_MODELS, [])
     if Config.CUSTOM_LLM_PROVIDER_3_DEFAULT_MODEL and Config.CUSTOM_LLM_PROVIDER_3_DEFAULT_MODEL not in custom3_models:
-        custom3_models = [Config.CUSTOM_LLM_PROVIDER_3_DEFAULT_MODEL] + custom3_models
+        custom3_models = (Config.CUSTOM_LLM_PROVIDER_3_DEFAULT_MODEL,) + tuple(custom3_models)
     return {
         "openai": _build_model_option_items(openai_models, include_supports_images=True),
         "custom1": _build_model_option_items(custom1_models, include_supports_images=False),
@@ -1775,141 +1443,78 @@ def _submission_requires_images(submission):
     return False
 
 
+_SCHEMA_UPDATES = {
+    "assignment": (
+        ("folder_name", "VARCHAR(255)"),
+        ("archived_at", "DATETIME"),
+    ),
+    "grading_job": (
+        ("llm_model", "VARCHAR(128)"),
+        ("prompt_tokens", "INTEGER"),
+        ("completion_tokens", "INTEGER"),
+        ("total_tokens", "INTEGER"),
+        ("price_estimate", "REAL"),
+        ("llm_provider", "VARCHAR(64)"),
+        ("formatted_output", "INTEGER DEFAULT 0"),
+        ("extra_instructions", "TEXT DEFAULT ''"),
+    ),
+    "rubric_version": (
+        ("llm_model", "VARCHAR(128)"),
+        ("llm_provider", "VARCHAR(64)"),
+        ("formatted_output", "INTEGER DEFAULT 0"),
+        ("extra_instructions", "TEXT DEFAULT ''"),
+        ("error_message", "TEXT DEFAULT ''"),
+        ("raw_response", "TEXT DEFAULT ''"),
+        ("prompt_tokens", "INTEGER"),
+        ("completion_tokens", "INTEGER"),
+        ("total_tokens", "INTEGER"),
+        ("price_estimate", "REAL"),
+        ("finished_at", "DATETIME"),
+    ),
+}
+
+# Declared on the models for fresh databases; created here for existing ones.
+_SCHEMA_INDEXES = (
+    ("ix_rubric_version_assignment_status", "rubric_version", "assignment_id, status"),
+    ("ix_submission_assignment", "submission", "assignment_id"),
+    ("ix_submission_file_submission", "submission_file", "submission_id"),
+    ("ix_grading_job_assignment_status", "grading_job", "assignment_id, status"),
+    ("ix_grading_job_submission", "grading_job", "submission_id"),
+    ("ix_grading_job_status", "grading_job", "status"),
+    ("ix_grade_result_submission_rubric", "grade_result", "submission_id, rubric_version_id"),
+)
+
+_schema_updates_applied = False
+
+
 def _ensure_schema_updates():
+    # Batch all missing-column ALTERs into a single transaction so SQLite
+    # pays one fsync instead of one per column, and only run once per
+    # process.
+    global _schema_updates_applied
+    if _schema_updates_applied:
+        return
     if db.engine.dialect.name != "sqlite":
         return
     try:
-        result = db.session.execute(text("PRAGMA table_info(assignment)"))
-        assignment_columns = {row[1] for row in result.fetchall()}
-        if "folder_name" not in assignment_columns:
-            db.session.execute(
-                text("ALTER TABLE assignment ADD COLUMN folder_name VARCHAR(255)")
-            )
-            db.session.commit()
-            logger.info("Added folder_name column to assignment table")
-        if "archived_at" not in assignment_columns:
-            db.session.execute(
-                text("ALTER TABLE assignment ADD COLUMN archived_at DATETIME")
-            )
-            db.session.commit()
-            logger.info("Added archived_at column to assignment table")
-        result = db.session.execute(text("PRAGMA table_info(grading_job)"))
-        columns = {row[1] for row in result.fetchall()}
-        if "llm_model" not in columns:
-            db.session.execute(
-                text("ALTER TABLE grading_job ADD COLUMN llm_model VARCHAR(128)")
-            )
-            db.session.commit()
-            logger.info("Added llm_model column to grading_job table")
-        if "prompt_tokens" not in columns:
-            db.session.execute(
-                text("ALTER TABLE grading_job ADD COLUMN prompt_tokens INTEGER")
-            )
-            db.session.commit()
-        if "completion_tokens" not in columns:
-            db.session.execute(
-                text("ALTER TABLE grading_job ADD COLUMN completion_tokens INTEGER")
-            )
-            db.session.commit()
-        if "total_tokens" not in columns:
-            db.session.execute(
-                text("ALTER TABLE grading_job ADD COLUMN total_tokens INTEGER")
-            )
-            db.session.commit()
-        if "price_estimate" not in columns:
-            db.session.execute(
-                text("ALTER TABLE grading_job ADD COLUMN price_estimate REAL")
-            )
-            db.session.commit()
-        if "llm_provider" not in columns:
-            db.session.execute(
-                text("ALTER TABLE grading_job ADD COLUMN llm_provider VARCHAR(64)")
-            )
-            db.session.commit()
-            logger.info("Added llm_provider column to grading_job table")
-        if "formatted_output" not in columns:
-            db.session.execute(
-                text(
-                    "ALTER TABLE grading_job ADD COLUMN formatted_output INTEGER DEFAULT 0"
-                )
-            )
-            db.session.commit()
-            logger.info("Added formatted_output column to grading_job table")
-        if "extra_instructions" not in columns:
-            db.session.execute(
-                text(
-                    "ALTER TABLE grading_job ADD COLUMN extra_instructions TEXT DEFAULT ''"
-                )
-            )
-            db.session.commit()
-            logger.info("Added extra_instructions column to grading_job table")
-        result = db.session.execute(text("PRAGMA table_info(rubric_version)"))
-        rubric_columns = {row[1] for row in result.fetchall()}
-        if "llm_model" not in rubric_columns:
-            db.session.execute(
-                text("ALTER TABLE rubric_version ADD COLUMN llm_model VARCHAR(128)")
-            )
-            db.session.commit()
-            logger.info("Added llm_model column to rubric_version table")
-        if "llm_provider" not in rubric_columns:
-            db.session.execute(
-                text("ALTER TABLE rubric_version ADD COLUMN llm_provider VARCHAR(64)")
-            )
-            db.session.commit()
-            logger.info("Added llm_provider column to rubric_version table")
-        if "formatted_output" not in rubric_columns:
-            db.session.execute(
-                text(
-                    "ALTER TABLE rubric_version ADD COLUMN formatted_output INTEGER DEFAULT 0"
+        for table, columns in _SCHEMA_UPDATES.items():
+            result = db.session.execute(text(f"PRAGMA table_info({table})"))
+            existing = {row[1] for row in result.fetchall()}
+            for column, column_type in columns:
+                if column in existing:
+                    continue
+                db.session.execute(
+                    text(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
                 )
-            )
-            db.session.commit()
-            logger.info("Added formatted_output column to rubric_version table")
-        if "extra_instructions" not in rubric_columns:
+                logger.info("Added %s column to %s table", column, table)
+        for index_name, table, columns in _SCHEMA_INDEXES:
             db.session.execute(
                 text(
-                    "ALTER TABLE rubric_version ADD COLUMN extra_instructions TEXT DEFAULT ''"
+                    f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({columns})"
                 )
             )
-            db.session.commit()
-            logger.info("Added extra_instructions column to rubric_version table")
-        if "error_message" not in rubric_columns:
-            db.session.execute(
-                text("ALTER TABLE rubric_version ADD COLUMN error_message TEXT DEFAULT ''")
-            )
-            db.session.commit()
-            logger.info("Added error_message column to rubric_version table")
-        if "raw_response" not in rubric_columns:
-            db.session.execute(
-                text("ALTER TABLE rubric_version ADD COLUMN raw_response TEXT DEFAULT ''")
-            )
-            db.session.commit()
-            logger.info("Added raw_response column to rubric_version table")
-        if "prompt_tokens" not in rubric_columns:
-            db.session.execute(
-                text("ALTER TABLE rubric_version ADD COLUMN prompt_tokens INTEGER")
-            )
-            db.session.commit()
-        if "completion_tokens" not in rubric_columns:
-            db.session.execute(
-                text("ALTER TABLE rubric_version ADD COLUMN completion_tokens INTEGER")
-            )
-            db.session.commit()
-        if "total_tokens" not in rubric_columns:
-            db.session.execute(
-                text("ALTER TABLE rubric_version ADD COLUMN total_tokens INTEGER")
-            )
-            db.session.commit()
-        if "price_estimate" not in rubric_columns:
-            db.session.execute(
-                text("ALTER TABLE rubric_version ADD COLUMN price_estimate REAL")
-            )
-            db.session.commit()
-        if "finished_at" not in rubric_columns:
-            db.session.execute(
-                text("ALTER TABLE rubric_version ADD COLUMN finished_at DATETIME")
-            )
-            db.session.commit()
+        db.session.commit()
+        _schema_updates_applied = True
     except Exception:
         logger.exception("Failed to apply schema updates")
         db.session.rollback()
@@ -1933,8 +1538,15 @@ def _get_approved_rubric(assignment_id):
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    app.json = OrjsonProvider(app)
     app.jinja_env.globals["t"] = t
 
+    jinja_cache_dir = DATA_DIR / ".jinja_cache"
+    jinja_cache_dir.mkdir(parents=True, exist_ok=True)
+    app.jinja_env.bytecode_cache = jinja2.FileSystemBytecodeCache(str(jinja_cache_dir))
+    app.jinja_env.auto_reload = app.debug
+    app.jinja_env.cache_size = 400
+
     _init_logging()
     db.init_app(app)
 
@@ -1943,6 +1555,10 @@ def create_app():
         db.create_all()
         _ensure_schema_updates()
 
+    # Warm the Config-derived dropdown cache so the first request after boot
+    # doesn't pay for parsing the model option lists.
+    _provider_model_option_items()
+
     init_job_queue(app)
 
     @app.errorhandler(413)
@@ -1953,6 +1569,9 @@ def create_app():
     @app.before_request
     def set_locale():
         g.locale = _get_locale()
+        # Pick the catalog lookup once per request; t() then does a single
+        # C-level dict probe per key.
+        g.translate = _T_CS_GET if g.locale == "cs" else _T_EN_GET
 
     @app.context_processor
     def inject_settings():
@@ -2143,7 +1762,7 @@ def create_app():
 
     @app.route("/assignment-generations/<int:generation_id>/status.json")
     def assignment_generation_status(generation_id):
-        generation = AssignmentGeneration.query.get_or_404(generation_id)
+        generation = _get_or_404(AssignmentGeneration, generation_id)
         payload = {"status": generation.status}
         if generation.assignment_id:
             payload["assignment_id"] = generation.assignment_id
@@ -2153,7 +1772,7 @@ def create_app():
 
     @app.route("/assignments/<int:assignment_id>")
     def assignment_detail(assignment_id):
-        assignment = Assignment.query.get_or_404(assignment_id)
+        assignment = _get_or_404(Assignment, assignment_id)
         assignment_html = _render_markdown(assignment.assignment_text)
         rubrics = (
             RubricVersion.query.filter_by(assignment_id=assignment_id)
@@ -2162,11 +1781,13 @@ def create_app():
         )
         submissions = (
             Submission.query.filter_by(assignment_id=assignment_id)
+            .options(selectinload(Submission.grade_results))
             .order_by(Submission.created_at.desc())
             .all()
         )
         jobs = (
             GradingJob.query.filter_by(assignment_id=assignment_id)
+            .options(selectinload(GradingJob.submission))
             .order_by(GradingJob.created_at.desc())
             .all()
         )
@@ -2176,6 +1797,7 @@ def create_app():
         has_pending_rubrics = any(
             rubric.status == RubricStatus.GENERATING for rubric in rubrics
         )
+        now = _utcnow()
         for rubric in rubrics:
             if rubric.llm_model:
                 rubric.provider_display = _provider_display(
@@ -2188,40 +1810,11 @@ def create_app():
             rubric.preview_parts = preview["parts"]
             rubric.preview_truncated = preview["truncated"]
             rubric.preview_text = preview["text"]
-            if rubric.finished_at:
-                finished_at = _as_utc(rubric.finished_at)
-                created_at = _as_utc(rubric.created_at)
-                if finished_at and created_at:
-                    rubric.duration_seconds = (finished_at - created_at).total_seconds()
-                else:
-                    rubric.duration_seconds = None
-            elif rubric.status == RubricStatus.GENERATING:
-                created_at = _as_utc(rubric.created_at)
-                if created_at:
-                    rubric.duration_seconds = (_utcnow() - created_at).total_seconds()
-                else:
-                    rubric.duration_seconds = None
-            else:
-                rubric.duration_seconds = None
+            rubric.duration_seconds = _rubric_duration_seconds(rubric, now)
         for job in jobs:
             job.provider_display = _provider_display(
                 job.llm_provider or Config.LLM_PROVIDER
             )
-            if job.started_at and job.finished_at:
-                started_at = _as_utc(job.started_at)
-                finished_at = _as_utc(job.finished_at)
-                if started_at and finished_at:
-                    job.duration_seconds = (finished_at - started_at).total_seconds()
-                else:
-                    job.duration_seconds = None
-            elif job.started_at:
-                started_at = _as_utc(job.started_at)
-                if started_at:
-                    job.duration_seconds = (_utcnow() - started_at).total_seconds()
-                else:
-                    job.duration_seconds = None
-            else:
-                job.duration_seconds = None
             job.price_estimate_display = job.price_estimate
             if job.price_estimate_display is None:
                 job.price_estimate_display = _extract_price_estimate(job.message)
@@ -2232,7 +1825,11 @@ def create_app():
         has_active_jobs = any(
             job.status in {JobStatus.QUEUED, JobStatus.RUNNING} for job in jobs
         )
-        approved_rubric = _get_approved_rubric(assignment_id)
+        # rubrics is already ordered newest-first, so reuse it instead of
+        # issuing the _get_approved_rubric query again.
+        approved_rubric = next(
+            (r for r in rubrics if r.status == RubricStatus.APPROVED), None
+        )
         for submission in submissions:
             latest_result = None
             if submission.grade_results:
@@ -2240,41 +1837,32 @@ def create_app():
             if not latest_result:
                 submission.grade_display = "--"
                 continue
-            data, _error = safe_json_loads(latest_result.json_result)
-            if not data:
-                submission.grade_display = _format_points(latest_result.total_points)
-                continue
-            parts = data.get("parts", [])
-            total_possible = 0.0
-            has_possible = False
-            for part in parts:
-                try:
-                    value = float(part.get("points_possible"))
-                except (TypeError, ValueError):
-                    value = None
-                if value is None:
-                    continue
-                total_possible += value
-                has_possible = True
-            total_points = data.get("total_points", latest_result.total_points)
-            if has_possible:
-                submission.grade_display = (
-                    f"{_format_points(total_points)}/{_format_points(total_possible)}"
-                )
-            else:
-                submission.grade_display = _format_points(total_points)
-        total_price_estimate = 0.0
-        has_price_estimate = False
-        for rubric in rubrics:
-            if rubric.price_estimate is not None:
-                total_price_estimate += rubric.price_estimate
-                has_price_estimate = True
-        for job in jobs:
-            if job.price_estimate_display is not None:
-                total_price_estimate += job.price_estimate_display
-                has_price_estimate = True
-        if not has_price_estimate:
-            total_price_estimate = None
+            submission.grade_display = _grade_display(
+                latest_result.json_result, latest_result.total_points
+            )
+        # Jobs persist price_estimate at finish time, so the totals are plain
+        # SQL sums; message parsing only covers legacy rows without the column.
+        rubric_total = db.session.execute(
+            select(func.sum(RubricVersion.price_estimate)).where(
+                RubricVersion.assignment_id == assignment_id
+            )
+        ).scalar()
+        job_total = db.session.execute(
+            select(func.sum(GradingJob.price_estimate)).where(
+                GradingJob.assignment_id == assignment_id
+            )
+        ).scalar()
+        legacy_totals = [
+            job.price_estimate_display
+            for job in jobs
+            if job.price_estimate is None and job.price_estimate_display is not None
+        ]
+        summed = [
+            value
+            for value in (rubric_total, job_total, sum(legacy_totals) if legacy_totals else None)
+            if value is not None
+        ]
+        total_price_estimate = sum(summed) if summed else None
 
         provider_options = _provider_option_items()
         default_provider = _resolve_default_provider(
@@ -2302,7 +1890,7 @@ def create_app():
 
     @app.route("/assignments/<int:assignment_id>/edit", methods=["GET", "POST"])
     def edit_assignment(assignment_id):
-        assignment = Assignment.query.get_or_404(assignment_id)
+        assignment = _get_or_404(Assignment, assignment_id)
         if request.method == "POST":
             title = request.form.get("title", "").strip()
             assignment_text = request.form.get("assignment_text", "").strip()
@@ -2333,7 +1921,7 @@ def create_app():
 
     @app.route("/assignments/<int:assignment_id>/delete", methods=["POST"])
     def delete_assignment(assignment_id):
-        assignment = Assignment.query.get_or_404(assignment_id)
+        assignment = _get_or_404(Assignment, assignment_id)
         delete_mode = request.form.get("delete_mode", "hard").strip().lower()
         if delete_mode == "archive":
             assignment.archived_at = _utcnow()
@@ -2385,24 +1973,45 @@ def create_app():
 
     @app.route("/assignments/<int:assignment_id>/status.json")
     def assignment_status(assignment_id):
-        rubrics = RubricVersion.query.filter_by(assignment_id=assignment_id).all()
-        jobs = GradingJob.query.filter_by(assignment_id=assignment_id).all()
-        has_active_jobs = any(
-            job.status in {JobStatus.QUEUED, JobStatus.RUNNING} for job in jobs
+        # Polled endpoint: fetch only the status columns instead of hydrating
+        # full rubric and job objects.
+        rubric_statuses = tuple(
+            db.session.execute(
+                select(RubricVersion.status).where(
+                    RubricVersion.assignment_id == assignment_id
+                )
+            ).scalars()
         )
-        has_pending_rubrics = any(
-            rubric.status == RubricStatus.GENERATING for rubric in rubrics
+        has_pending_rubrics = RubricStatus.GENERATING in rubric_statuses
+        job_statuses = tuple(
+            db.session.execute(
+                select(GradingJob.status).where(
+                    GradingJob.assignment_id == assignment_id
+                )
+            ).scalars()
         )
-        return jsonify(
+        has_active_jobs = any(
+            status in {JobStatus.QUEUED, JobStatus.RUNNING} for status in job_statuses
+        )
+        # Weak ETag over the raw statuses lets unchanged polls return 304
+        # with no body at all.
+        etag = hashlib.blake2b(
+            repr((rubric_statuses, job_statuses)).encode(), digest_size=8
+        ).hexdigest()
+        if request.if_none_match.contains(etag):
+            return Response(status=304)
+        response = jsonify(
             {
                 "has_active_jobs": has_active_jobs,
                 "has_pending_rubrics": has_pending_rubrics,
             }
         )
+        response.set_etag(etag)
+        return response
 
     @app.route("/assignments/<int:assignment_id>/move", methods=["POST"])
     def move_assignment(assignment_id):
-        assignment = Assignment.query.get_or_404(assignment_id)
+        assignment = _get_or_404(Assignment, assignment_id)
         data = request.get_json(silent=True) or {}
         folder_name = data.get("folder_name")
         if folder_name is None:
@@ -2668,7 +2277,7 @@ def create_app():
 
     @app.route("/assignments/<int:assignment_id>/rubrics/generate_draft", methods=["POST"])
     def generate_rubric(assignment_id):
-        assignment = Assignment.query.get_or_404(assignment_id)
+        assignment = _get_or_404(Assignment, assignment_id)
         provider_key = _resolve_provider_from_form(
             request.form, app.config.get("LLM_PROVIDER")
         )
@@ -2701,7 +2310,7 @@ def create_app():
 
     @app.route("/rubrics/<int:rubric_id>/approve", methods=["POST"])
     def approve_rubric(rubric_id):
-        rubric = RubricVersion.query.get_or_404(rubric_id)
+        rubric = _get_or_404(RubricVersion, rubric_id)
         if rubric.status not in {RubricStatus.DRAFT, RubricStatus.ARCHIVED}:
             flash("Only DRAFT or ARCHIVED guides can be activated.")
             return redirect(url_for("assignment_detail", assignment_id=rubric.assignment_id))
@@ -2719,7 +2328,7 @@ def create_app():
 
     @app.route("/rubrics/<int:rubric_id>/cancel", methods=["POST"])
     def cancel_rubric(rubric_id):
-        rubric = RubricVersion.query.get_or_404(rubric_id)
+        rubric = _get_or_404(RubricVersion, rubric_id)
         if rubric.status != RubricStatus.GENERATING:
             flash("Grading guide is not generating.")
             return redirect(url_for("rubric_detail", rubric_id=rubric.id))
@@ -2734,7 +2343,7 @@ def create_app():
 
     @app.route("/rubrics/<int:rubric_id>/rerun", methods=["POST"])
     def rerun_rubric(rubric_id):
-        rubric = RubricVersion.query.get_or_404(rubric_id)
+        rubric = _get_or_404(RubricVersion, rubric_id)
         if rubric.status != RubricStatus.ERROR:
             flash("Only failed grading guides can be rerun.")
             return redirect(url_for("rubric_detail", rubric_id=rubric.id))
@@ -2767,7 +2376,7 @@ def create_app():
 
     @app.route("/rubrics/<int:rubric_id>/save_template", methods=["POST"])
     def save_rubric_template(rubric_id):
-        rubric = RubricVersion.query.get_or_404(rubric_id)
+        rubric = _get_or_404(RubricVersion, rubric_id)
         template_name = (request.form.get("template_name") or "").strip()
         if not template_name:
             flash("Template name is required.")
@@ -2872,42 +2481,35 @@ def create_app():
 
     @app.route("/rubrics/<int:rubric_id>/delete", methods=["POST"])
     def delete_rubric(rubric_id):
-        rubric = RubricVersion.query.get_or_404(rubric_id)
+        rubric = _get_or_404(RubricVersion, rubric_id)
         if rubric.status == RubricStatus.GENERATING:
             flash("Cancel guide generation before deleting.")
             return redirect(url_for("rubric_detail", rubric_id=rubric.id))
 
+        # Read before the commit: the bulk delete leaves the loaded instance
+        # in the session, and touching it afterwards would refresh a deleted
+        # row.
+        assignment_id = rubric.assignment_id
         GradingJob.query.filter_by(rubric_version_id=rubric_id).delete(
             synchronize_session=False
         )
         GradeResult.query.filter_by(rubric_version_id=rubric_id).delete(
             synchronize_session=False
         )
-        db.session.delete(rubric)
+        RubricVersion.query.filter_by(id=rubric_id).delete(synchronize_session=False)
         db.session.commit()
         flash("Grading guide deleted.")
-        return redirect(url_for("assignment_detail", assignment_id=rubric.assignment_id))
+        return redirect(url_for("assignment_detail", assignment_id=assignment_id))
 
     @app.route("/rubrics/<int:rubric_id>")
     def rubric_detail(rubric_id):
-        rubric = RubricVersion.query.get_or_404(rubric_id)
-        assignment = Assignment.query.get_or_404(rubric.assignment_id)
+        rubric = _get_or_404(RubricVersion, rubric_id)
+        assignment = _get_or_404(Assignment, rubric.assignment_id)
         assignment_html = _render_markdown(assignment.assignment_text)
-        duration_seconds = None
-        if rubric.finished_at:
-            finished_at = _as_utc(rubric.finished_at)
-            created_at = _as_utc(rubric.created_at)
-            if finished_at and created_at:
-                duration_seconds = (finished_at - created_at).total_seconds()
-        elif rubric.status == RubricStatus.GENERATING:
-            created_at = _as_utc(rubric.created_at)
-            if created_at:
-                duration_seconds = (_utcnow() - created_at).total_seconds()
+        duration_seconds = _rubric_duration_seconds(rubric, _utcnow())
         rubric_structured = None
         if rubric.rubric_text:
-            structured, _error = safe_json_loads(rubric.rubric_text)
-            if isinstance(structured, dict) and structured.get("parts"):
-                rubric_structured = structured
+            rubric_structured = _parsed_rubric_structured(rubric.rubric_text)
         rubric_structured_rendered = None
         if rubric_structured:
             rubric_structured_rendered = _render_rubric_structured_markdown(
@@ -2915,9 +2517,9 @@ def create_app():
             )
         reference_structured = None
         if rubric.reference_solution_text:
-            structured, _error = safe_json_loads(rubric.reference_solution_text)
-            if isinstance(structured, dict):
-                reference_structured = structured
+            reference_structured = _parsed_reference_structured(
+                rubric.reference_solution_text
+            )
         reference_structured_rendered = None
         if reference_structured:
             reference_structured_rendered = _render_reference_structured_markdown(
@@ -2940,7 +2542,7 @@ def create_app():
 
     @app.route("/rubrics/<int:rubric_id>/edit", methods=["GET", "POST"])
     def edit_rubric(rubric_id):
-        rubric = RubricVersion.query.get_or_404(rubric_id)
+        rubric = _get_or_404(RubricVersion, rubric_id)
         if rubric.status not in {RubricStatus.DRAFT, RubricStatus.APPROVED}:
             flash("Only DRAFT or APPROVED grading guides can be edited.")
             return redirect(url_for("rubric_detail", rubric_id=rubric.id))
@@ -3009,7 +2611,7 @@ def create_app():
                 rubric_structured = {"parts": parts}
                 if has_total:
                     rubric_structured["total_points"] = total_points
-                rubric_text = json.dumps(rubric_structured, ensure_ascii=True, indent=2)
+                rubric_text = dump_json(rubric_structured, indent=True)
             else:
                 rubric_text = request.form.get("rubric_text", "").strip()
 
@@ -3018,9 +2620,7 @@ def create_app():
                 if ref_errors:
                     flash(" ".join(ref_errors))
                     return redirect(url_for("edit_rubric", rubric_id=rubric.id))
-                reference_solution_text = json.dumps(
-                    reference_parts, ensure_ascii=True, indent=2
-                )
+                reference_solution_text = dump_json(reference_parts, indent=True)
             else:
                 reference_solution_text = request.form.get(
                     "reference_solution_text", ""
@@ -3049,7 +2649,7 @@ def create_app():
 
     @app.route("/assignments/<int:assignment_id>/submissions/upload", methods=["POST"])
     def upload_submission(assignment_id):
-        assignment = Assignment.query.get_or_404(assignment_id)
+        assignment = _get_or_404(Assignment, assignment_id)
         approved_rubric = _get_approved_rubric(assignment_id)
         if not approved_rubric:
             flash("Approve a grading guide before uploading submissions.")
@@ -3084,7 +2684,9 @@ def create_app():
                 submitted_text=submitted_text,
             )
             db.session.add(submission)
-            db.session.commit()
+            # flush assigns the id save_submission_files needs; the single
+            # commit below persists the submission and its file rows together.
+            db.session.flush()
 
             file_storages = request.files.getlist("files")
             save_submission_files(submission, file_storages)
@@ -3095,8 +2697,20 @@ def create_app():
             flash("No submissions found in upload.")
             return redirect(url_for("assignment_detail", assignment_id=assignment_id))
 
-        requires_images = any(
-            _submission_requires_images(submission) for submission in submissions
+        # One indexed lookup instead of lazily loading every submission's
+        # file list just to see whether any upload needs an image model.
+        requires_images = (
+            db.session.execute(
+                select(SubmissionFile.id)
+                .where(
+                    SubmissionFile.submission_id.in_(
+                        [submission.id for submission in submissions]
+                    ),
+                    SubmissionFile.file_type.in_(["pdf", "image"]),
+                )
+                .limit(1)
+            ).first()
+            is not None
         )
         if (
             requires_images
@@ -3107,8 +2721,8 @@ def create_app():
             flash("Selected model does not support images. Choose an image-capable model.")
             return redirect(url_for("assignment_detail", assignment_id=assignment_id))
 
-        for submission in submissions:
-            job = GradingJob(
+        jobs = [
+            GradingJob(
                 assignment_id=assignment_id,
                 submission_id=submission.id,
                 rubric_version_id=approved_rubric.id,
@@ -3118,21 +2732,27 @@ def create_app():
                 formatted_output=formatted_output,
                 extra_instructions=extra_instructions,
             )
-            db.session.add(job)
-            db.session.commit()
-            queue_id = enqueue_submission_job(job.id)
+            for submission in submissions
+        ]
+        db.session.add_all(jobs)
+        # Persist the batch before enqueueing so workers can see the rows,
+        # then record the queue ids with one more commit.
+        db.session.commit()
+        queue_ids = enqueue_submission_jobs([job.id for job in jobs])
+        for job, queue_id in zip(jobs, queue_ids):
             job.queue_job_id = queue_id
-            db.session.commit()
+        db.session.commit()
 
         flash(f"Queued {len(submissions)} submission(s) for grading.")
         return redirect(url_for("assignment_detail", assignment_id=assignment_id))
 
     @app.route("/submissions/<int:submission_id>")
     def submission_detail(submission_id):
-        submission = Submission.query.get_or_404(submission_id)
+        submission = _get_or_404(Submission, submission_id)
         assignment = db.session.get(Assignment, submission.assignment_id)
         grade_result = (
-            GradeResult.query.filter_by(submission_id=submission.id)
+            GradeResult.query.options(joinedload(GradeResult.rubric_version))
+            .filter_by(submission_id=submission.id)
             .order_by(GradeResult.created_at.desc())
             .first()
         )
@@ -3144,20 +2764,18 @@ def create_app():
         else:
             rubric = _get_approved_rubric(submission.assignment_id)
         if rubric and rubric.rubric_text:
-            structured, _error = safe_json_loads(rubric.rubric_text)
-            if isinstance(structured, dict) and structured.get("parts"):
-                rubric_structured = structured
+            rubric_structured = _parsed_rubric_structured(rubric.rubric_text)
         if rubric and rubric.reference_solution_text:
-            structured, _error = safe_json_loads(rubric.reference_solution_text)
-            if isinstance(structured, dict):
-                reference_structured = structured
+            reference_structured = _parsed_reference_structured(
+                rubric.reference_solution_text
+            )
         images = collect_submission_images(submission)
-        image_rel_paths = []
-        for path in images:
-            try:
-                image_rel_paths.append(str(Path(path).relative_to(DATA_DIR)))
-            except ValueError:
-                image_rel_paths.append(path)
+        # Plain prefix stripping; Path construction plus the ValueError
+        # round-trip is needless per image.
+        image_rel_paths = [
+            path[len(_DATA_DIR_PREFIX):] if path.startswith(_DATA_DIR_PREFIX) else path
+            for path in images
+        ]
         student_text = collect_submission_text(submission)
         student_text_html = _render_markdown(student_text)
         assignment_text_html = _render_markdown(assignment.assignment_text or "")
@@ -3182,7 +2800,7 @@ def create_app():
 
     @app.route("/submissions/<int:submission_id>/grade/edit", methods=["POST"])
     def edit_submission_grade(submission_id):
-        submission = Submission.query.get_or_404(submission_id)
+        submission = _get_or_404(Submission, submission_id)
         grade_result = (
             GradeResult.query.filter_by(submission_id=submission.id)
             .order_by(GradeResult.created_at.desc())
@@ -3210,7 +2828,7 @@ def create_app():
                 flash("Total points must be a number.")
                 return redirect(url_for("submission_detail", submission_id=submission_id))
         grade_result.total_points = data.get("total_points")
-        grade_result.json_result = json.dumps(data, ensure_ascii=True, indent=2)
+        grade_result.json_result = dump_json(data, indent=True)
         if rendered_text:
             grade_result.rendered_text = rendered_text
         else:
@@ -3223,7 +2841,7 @@ def create_app():
 
     @app.route("/submissions/<int:submission_id>/delete", methods=["POST"])
     def delete_submission(submission_id):
-        submission = Submission.query.get_or_404(submission_id)
+        submission = _get_or_404(Submission, submission_id)
         assignment_id = submission.assignment_id
         active_job = (
             GradingJob.query.filter_by(submission_id=submission.id)
@@ -3234,57 +2852,69 @@ def create_app():
             flash("Cancel running jobs before deleting the submission.")
             return redirect(url_for("assignment_detail", assignment_id=assignment_id))
 
-        GradeResult.query.filter_by(submission_id=submission.id).delete(
+        # Read before the commit: the bulk delete leaves the loaded instance
+        # in the session, and touching it afterwards would refresh a deleted
+        # row.
+        submission_pk = submission.id
+        GradeResult.query.filter_by(submission_id=submission_pk).delete(
             synchronize_session=False
         )
-        SubmissionFile.query.filter_by(submission_id=submission.id).delete(
+        SubmissionFile.query.filter_by(submission_id=submission_pk).delete(
             synchronize_session=False
         )
-        GradingJob.query.filter_by(submission_id=submission.id).delete(
+        GradingJob.query.filter_by(submission_id=submission_pk).delete(
             synchronize_session=False
         )
-        db.session.delete(submission)
+        Submission.query.filter_by(id=submission_pk).delete(synchronize_session=False)
         db.session.commit()
 
-        shutil.rmtree(
-            UPLOAD_DIR / f"assignment_{assignment_id}" / f"submission_{submission.id}",
-            ignore_errors=True,
-        )
-        shutil.rmtree(
-            PROCESSED_DIR / f"assignment_{assignment_id}" / f"submission_{submission.id}",
-            ignore_errors=True,
-        )
+        enqueue_cleanup_job(assignment_id, submission_pk)
 
         flash("Submission deleted.")
         return redirect(url_for("assignment_detail", assignment_id=assignment_id))
 
     @app.route("/assignments/<int:assignment_id>/export.csv")
     def export_csv(assignment_id):
-        assignment = Assignment.query.get_or_404(assignment_id)
-        submissions = (
-            Submission.query.filter_by(assignment_id=assignment_id)
-            .order_by(Submission.created_at.asc())
-            .all()
-        )
-
-        results_by_submission = {
-            result.submission_id: result
-            for result in GradeResult.query.join(Submission)
-            .filter(Submission.assignment_id == assignment_id)
-            .all()
-        }
-
-        max_parts = 0
-        parsed_results = {}
-        for submission in submissions:
-            result = results_by_submission.get(submission.id)
-            if not result:
-                continue
-            data, _error = safe_json_loads(result.json_result)
-            if data:
-                parts = data.get("parts", [])
-                parsed_results[submission.id] = data
-                max_parts = max(max_parts, len(parts))
+        assignment = _get_or_404(Assignment, assignment_id)
+
+        # Track the newest result per submission from id/timestamp columns
+        # only; the widest parts list comes from the SQL JSON functions so
+        # no result body is parsed in Python up front.
+        latest_result_ids = {}
+        result_rows = db.session.execute(
+            select(GradeResult.id, GradeResult.submission_id)
+            .join(Submission, GradeResult.submission_id == Submission.id)
+            .where(Submission.assignment_id == assignment_id)
+            .order_by(GradeResult.created_at.asc())
+        )
+        for result_id, submission_id in result_rows:
+            latest_result_ids[submission_id] = result_id
+
+        if db.engine.dialect.name == "sqlite":
+            max_parts = db.session.execute(
+                text(
+                    "SELECT COALESCE(MAX(json_array_length("
+                    "json_extract(gr.json_result, '$.parts'))), 0) "
+                    "FROM grade_result gr "
+                    "JOIN submission s ON s.id = gr.submission_id "
+                    "WHERE s.assignment_id = :aid AND json_valid(gr.json_result)"
+                ),
+                {"aid": assignment_id},
+            ).scalar()
+        else:
+            max_parts = 0
+            json_rows = db.session.execute(
+                select(GradeResult.json_result)
+                .join(Submission, GradeResult.submission_id == Submission.id)
+                .where(Submission.assignment_id == assignment_id)
+                .execution_options(yield_per=200)
+            ).scalars()
+            for json_result in json_rows:
+                data, _error = (
+                    safe_json_loads(json_result) if json_result else (None, "")
+                )
+                if data:
+                    max_parts = max(max_parts, len(data.get("parts", [])))
 
         headers = ["student_identifier", "total_points"]
         for idx in range(1, max_parts + 1):
@@ -3292,45 +2922,69 @@ def create_app():
         headers.append("rendered_text")
 
         def generate_rows():
-            output = io.StringIO()
-            writer = csv.writer(output)
-            writer.writerow(headers)
-            yield output.getvalue()
-            output.seek(0)
-            output.truncate(0)
-
-            for submission in submissions:
-                result = results_by_submission.get(submission.id)
-                row = [submission.student_identifier, ""]
-                parts_values = ["" for _ in range(max_parts)]
-                rendered_text = ""
-
-                if result:
-                    data = parsed_results.get(submission.id)
+            writer = csv.writer(_Echo())
+            yield writer.writerow(headers)
+
+            rows = db.session.execute(
+                select(
+                    Submission.id,
+                    Submission.student_identifier,
+                    GradeResult.id,
+                    GradeResult.json_result,
+                    GradeResult.rendered_text,
+                )
+                .outerjoin(GradeResult, GradeResult.submission_id == Submission.id)
+                .where(Submission.assignment_id == assignment_id)
+                .order_by(Submission.created_at.asc())
+                .execution_options(yield_per=200)
+            )
+            for (
+                submission_id,
+                student_identifier,
+                result_id,
+                json_result,
+                rendered_text,
+            ) in rows:
+                expected_result_id = latest_result_ids.get(submission_id)
+                if expected_result_id is not None and result_id != expected_result_id:
+                    continue
+                row = [student_identifier, ""]
+                parts_values = [""] * max_parts
+                rendered = ""
+
+                if result_id is not None:
+                    data, _error = (
+                        safe_json_loads(json_result) if json_result else (None, "")
+                    )
                     if data:
                         row[1] = data.get("total_points", "")
                         parts = data.get("parts", [])
                         for idx, part in enumerate(parts[:max_parts]):
                             parts_values[idx] = part.get("points_awarded", "")
-                        rendered_text = result.rendered_text or ""
+                        rendered = rendered_text or ""
                 row.extend(parts_values)
-                row.append(rendered_text)
+                row.append(rendered)
 
-                writer.writerow(row)
-                yield output.getvalue()
-                output.seek(0)
-                output.truncate(0)
+                yield writer.writerow(row)
 
         filename = f"assignment_{assignment.id}_grades.csv"
         return Response(
-            generate_rows(),
+            stream_with_context(generate_rows()),
             mimetype="text/csv",
             headers={"Content-Disposition": f"attachment; filename={filename}"},
         )
 
     @app.route("/jobs/<int:job_id>")
     def job_detail(job_id):
-        job = GradingJob.query.get_or_404(job_id)
+        # _submission_requires_images walks job.submission.files, so pull
+        # both relationships in the same round-trip.
+        job = db.session.get(
+            GradingJob,
+            job_id,
+            options=[joinedload(GradingJob.submission).selectinload(Submission.files)],
+        )
+        if job is None:
+            abort(404)
         auto_refresh = job.status in {JobStatus.QUEUED, JobStatus.RUNNING}
         submission_requires_images = _submission_requires_images(job.submission)
         job_provider_display = _provider_display(job.llm_provider or Config.LLM_PROVIDER)
@@ -3344,16 +2998,7 @@ def create_app():
             .order_by(GradeResult.created_at.desc())
             .first()
         )
-        duration_seconds = None
-        if job.started_at and job.finished_at:
-            started_at = _as_utc(job.started_at)
-            finished_at = _as_utc(job.finished_at)
-            if started_at and finished_at:
-                duration_seconds = (finished_at - started_at).total_seconds()
-        elif job.started_at:
-            started_at = _as_utc(job.started_at)
-            if started_at:
-                duration_seconds = (_utcnow() - started_at).total_seconds()
+        duration_seconds = job.duration_seconds
         provider_options = _provider_option_items()
         default_provider = _resolve_default_provider(
             _normalize_provider_key(Config.LLM_PROVIDER), provider_options
@@ -3362,7 +3007,7 @@ def create_app():
         rerun_provider = _resolve_default_provider(
             _normalize_provider_key(job.llm_provider or default_provider), provider_options
         )
-        return render_template(
+        rendered = render_template(
             "job_detail.html",
             job=job,
             duration_seconds=duration_seconds,
@@ -3378,47 +3023,81 @@ def create_app():
             job_provider_display=job_provider_display,
             rerun_provider=rerun_provider,
         )
+        response = Response(rendered)
+        if auto_refresh:
+            # The page polls status.json while the job runs; make sure the
+            # HTML itself is only fetched on real navigations.
+            response.headers["Cache-Control"] = "no-cache"
+        return response
 
     @app.route("/jobs/<int:job_id>/status.json")
     def job_status(job_id):
-        job = GradingJob.query.get_or_404(job_id)
+        # Column-only select: the poller doesn't need the message text or
+        # provider fields hydrated into a full ORM object.
+        row = db.session.execute(
+            select(
+                GradingJob.status, GradingJob.started_at, GradingJob.finished_at
+            ).where(GradingJob.id == job_id)
+        ).one_or_none()
+        if row is None:
+            abort(404)
+        status, started_at, finished_at = row
         duration_seconds = None
-        if job.started_at and job.finished_at:
-            started_at = _as_utc(job.started_at)
-            finished_at = _as_utc(job.finished_at)
-            if started_at and finished_at:
-                duration_seconds = (finished_at - started_at).total_seconds()
-        elif job.started_at:
-            started_at = _as_utc(job.started_at)
-            if started_at:
-                duration_seconds = (_utcnow() - started_at).total_seconds()
-        return jsonify(
+        if started_at:
+            started = _as_utc(started_at)
+            finished = _as_utc(finished_at) if finished_at else _utcnow()
+            duration_seconds = (finished - started).total_seconds()
+        etag = hashlib.blake2b(
+            f"{status}|{started_at}|{finished_at}".encode(), digest_size=8
+        ).hexdigest()
+        # While RUNNING the duration ticks every poll, so only finished or
+        # still-queued jobs can be answered with a bodyless 304.
+        if status != JobStatus.RUNNING and request.if_none_match.contains(etag):
+            return Response(status=304)
+        response = _json_response(
             {
-                "status": job.status,
+                "status": status,
                 "duration_seconds": duration_seconds,
-                "started_at": job.started_at.isoformat() if job.started_at else None,
-                "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+                "started_at": started_at,
+                "finished_at": finished_at,
             }
         )
+        response.headers["Cache-Control"] = "no-cache"
+        response.set_etag(etag)
+        return response
 
     @app.route("/jobs/<int:job_id>/terminate", methods=["POST"])
     def terminate_job(job_id):
-        job = GradingJob.query.get_or_404(job_id)
-        if job.status not in {JobStatus.QUEUED, JobStatus.RUNNING}:
-            flash("Job is not running or queued.")
-            return redirect(url_for("job_detail", job_id=job.id))
-        job.status = JobStatus.CANCELLED
-        if not job.finished_at:
-            job.finished_at = _utcnow()
-        if "Cancelled by user." not in job.message:
-            job.message = (job.message + "\n" if job.message else "") + "Cancelled by user."
+        result = db.session.execute(
+            update(GradingJob)
+            .where(
+                GradingJob.id == job_id,
+                GradingJob.status.in_([JobStatus.QUEUED, JobStatus.RUNNING]),
+            )
+            .values(
+                status=JobStatus.CANCELLED,
+                finished_at=func.coalesce(GradingJob.finished_at, _utcnow()),
+                message=case(
+                    (
+                        GradingJob.message.contains("Cancelled by user."),
+                        GradingJob.message,
+                    ),
+                    (GradingJob.message == "", "Cancelled by user."),
+                    else_=GradingJob.message + "\nCancelled by user.",
+                ),
+            )
+        )
         db.session.commit()
+        if result.rowcount == 0:
+            _get_or_404(GradingJob, job_id)
+            flash("Job is not running or queued.")
+            return redirect(url_for("job_detail", job_id=job_id))
         flash("Job cancelled.")
-        return redirect(url_for("job_detail", job_id=job.id))
+        return redirect(url_for("job_detail", job_id=job_id))
 
     @app.route("/jobs/<int:job_id>/delete", methods=["POST"])
     def delete_job(job_id):
-        job = GradingJob.query.get_or_404(job_id)
+        job = _get_or_404(GradingJob, job_id)
         if job.status in {JobStatus.QUEUED, JobStatus.RUNNING}:
             flash("Cancel the job before deleting.")
             return redirect(url_for("job_detail", job_id=job.id))
@@ -3431,13 +3110,15 @@ def create_app():
     def settings():
         if request.method == "POST":
             updates = {}
-            for field in _SETTINGS_FIELDS:
-                key = field["key"]
-                field_type = field.get("type")
-                if field_type == "checkbox":
-                    updates[key] = "1" if request.form.get(key) else "0"
-                elif key == "LLM_MODEL":
-                    selected = request.form.get(key, "").strip()
+            for key, raw in request.form.items():
+                # Interned form keys hit the identity fast path against the
+                # interned field table.
+                key = sys.intern(key)
+                field = _SETTINGS_FIELD_BY_KEY.get(key)
+                if field is None or field.get("type") == "checkbox":
+                    continue
+                if key == "LLM_MODEL":
+                    selected = raw.strip()
                     if selected == "other":
                         custom_model = request.form.get("LLM_MODEL_CUSTOM", "").strip()
                         if not custom_model:
@@ -3447,30 +3128,34 @@ def create_app():
                     else:
                         updates[key] = selected or app.config.get(key, "")
                 else:
-                    updates[key] = request.form.get(key, "").strip()
+                    updates[key] = raw.strip()
+            for key in _CHECKBOX_KEYS:
+                updates[key] = "1" if request.form.get(key) else "0"
+            for key in _SETTINGS_FIELD_BY_KEY:
+                updates.setdefault(key, "")
             _update_env_file(updates)
             for key, value in updates.items():
                 os.environ[key] = value
-                app.config[key] = value
-                if key in {"LLM_USE_JSON_MODE", "LLM_FORMATTED_OUTPUT", "SHOW_COSTS"}:
-                    app.config[key] = value.lower() in {"1", "true", "yes", "on"}
-                if key in {
-                    "LLM_MAX_OUTPUT_TOKENS",
-                    "LLM_REQUEST_TIMEOUT",
-                    "LLM_IMAGE_TOKENS_PER_IMAGE",
-                    "MAX_CONTENT_LENGTH",
-                    "PDF_DPI",
-                    "PDF_TEXT_MIN_CHARS",
-                }:
-                    try:
-                        app.config[key] = int(value) if value else app.config.get(key)
-                    except ValueError:
-                        pass
-                if key in {"LLM_PRICE_INPUT_PER_1K", "LLM_PRICE_OUTPUT_PER_1K", "PDF_TEXT_MIN_RATIO"}:
+                coercer = _SETTING_COERCERS.get(key)
+                if coercer is None:
+                    coerced = value
+                elif coercer is _to_bool_setting:
+                    coerced = _to_bool_setting(value)
+                elif not value:
+                    coerced = app.config.get(key)
+                else:
                     try:
-                        app.config[key] = float(value) if value else app.config.get(key)
+                        coerced = coercer(value)
                     except ValueError:
-                        pass
+                        coerced = value
+                app.config[key] = coerced
+            _normalize_provider_key.cache_clear()
+            _provider_config.cache_clear()
+            _resolve_default_provider_cached.cache_clear()
+            _provider_display.cache_clear()
+            _provider_option_items_cached.cache_clear()
+            _parse_model_options_cached.cache_clear()
+            _provider_model_option_items.cache_clear()
             flash("Settings saved to .env. Restart may be required for some changes.")
             return redirect(url_for("settings"))
 
@@ -3485,44 +3170,24 @@ def create_app():
         base_fields = []
         provider_field_map = {"1": [], "2": [], "3": []}
         for field in _SETTINGS_FIELDS:
-            key = field["key"]
-            if key.startswith("CUSTOM_LLM_PROVIDER_1_"):
-                provider_field_map["1"].append(field)
-            elif key.startswith("CUSTOM_LLM_PROVIDER_2_"):
-                provider_field_map["2"].append(field)
-            elif key.startswith("CUSTOM_LLM_PROVIDER_3_"):
-                provider_field_map["3"].append(field)
+            group = field["provider_group"]
+            if group:
+                provider_field_map[group].append(field)
             else:
                 base_fields.append(field)
 
-        def clean_value(value):
-            return (value or "").strip().strip('"')
-
-        def has_provider_info(index):
-            default_name = f"Other {index}"
-            name_key = f"CUSTOM_LLM_PROVIDER_{index}_NAME"
-            api_key_key = f"CUSTOM_LLM_PROVIDER_{index}_API_KEY"
-            base_url_key = f"CUSTOM_LLM_PROVIDER_{index}_API_BASE_URL"
-            model_key = f"CUSTOM_LLM_PROVIDER_{index}_DEFAULT_MODEL"
-            models_key = f"CUSTOM_LLM_PROVIDER_{index}_MODELS"
-            name = clean_value(field_values.get(name_key))
-            if name and name != default_name:
-                return True
-            return any(
-                clean_value(field_values.get(key))
-                for key in [api_key_key, base_url_key, model_key, models_key]
-            )
-
         provider_groups = []
         for index in ["1", "2", "3"]:
-            name = clean_value(field_values.get(f"CUSTOM_LLM_PROVIDER_{index}_NAME"))
-            label = name or f"Other {index}"
+            name = _clean_setting_value(
+                field_values.get(f"CUSTOM_LLM_PROVIDER_{index}_NAME")
+            )
+            label = name or _OTHER_PROVIDER_LABELS[index]
             provider_groups.append(
                 {
                     "id": index,
                     "label": label,
                     "fields": provider_field_map[index],
-                    "has_info": has_provider_info(index),
+                    "has_info": _has_provider_info(field_values, index),
                 }
             )
         return render_template(
@@ -3538,7 +3203,7 @@ def create_app():
 
     @app.route("/jobs/<int:job_id>/rerun", methods=["POST"])
     def rerun_job(job_id):
-        job = GradingJob.query.get_or_404(job_id)
+        job = _get_or_404(GradingJob, job_id)
         rubric = db.session.get(RubricVersion, job.rubric_version_id)
         if not rubric or rubric.status != RubricStatus.APPROVED:
             flash("Approved grading guide required to rerun job.")
@@ -3565,9 +3230,6 @@ def create_app():
             raw_response="",
             error_message="",
         )
-        db.session.add(grade_result)
-        db.session.commit()
-
         new_job = GradingJob(
             assignment_id=job.assignment_id,
             submission_id=job.submission_id,
@@ -3578,6 +3240,7 @@ def create_app():
             formatted_output=formatted_output,
             extra_instructions=extra_instructions,
         )
+        db.session.add(grade_result)
         db.session.add(new_job)
         db.session.commit()
         queue_id = enqueue_submission_job(new_job.id)
@@ -3588,7 +3251,12 @@ def create_app():
 
     @app.route("/data/<path:filepath>")
     def data_file(filepath):
-        return send_from_directory(DATA_DIR, filepath)
+        # Uploaded and rendered files never change under their unique names,
+        # so let clients cache them and answer range/etag requests.
+        max_age = None
+        if filepath.startswith(("uploads/", "processed/")):
+            max_age = 31536000
+        return send_from_directory(DATA_DIR, filepath, conditional=True, max_age=max_age)
 
     return app
 
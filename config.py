@@ -17,6 +17,8 @@ class Config:
         "DATABASE_URL", f"sqlite:///{(DATA_DIR / 'app.db').as_posix()}"
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Larger compiled-statement cache so repeated queries skip SQL rendering.
+    SQLALCHEMY_ENGINE_OPTIONS = {"query_cache_size": 1200}
     MAX_CONTENT_LENGTH = int(os.environ.get("MAX_CONTENT_LENGTH", 50 * 1024 * 1024))
 
     LLM_API_KEY = os.environ.get("LLM_API_KEY", "")
@@ -76,6 +78,14 @@ class Config:
         "yes",
         "on",
     }
+    # Reuse identical grading responses within a worker process. Off by
+    # default so explicit reruns always get a fresh model judgment.
+    LLM_RESPONSE_CACHE = os.environ.get("LLM_RESPONSE_CACHE", "0").lower() in {
+        "1",
+        "true",
+        "yes",
+        "on",
+    }
     PROMPT_GRADING_ADDITIONAL = os.environ.get("PROMPT_GRADING_ADDITIONAL", "")
     PROMPT_RUBRIC_ADDITIONAL = os.environ.get("PROMPT_RUBRIC_ADDITIONAL", "")
     PROMPT_ASSIGNMENT_ADDITIONAL = os.environ.get("PROMPT_ASSIGNMENT_ADDITIONAL", "")
@@ -86,7 +96,20 @@ class Config:
         "on",
     }
 
+    # Let a fronting server (nginx X-Accel-Redirect / X-Sendfile) stream
+    # uploaded and rendered files instead of the Python worker.
+    USE_X_SENDFILE = os.environ.get("USE_X_SENDFILE", "0").lower() in {
+        "1",
+        "true",
+        "yes",
+        "on",
+    }
+
     REDIS_URL = os.environ.get("REDIS_URL", "")
+    # Threads draining the fallback in-process queue. Grading jobs spend
+    # most of their time waiting on the LLM, so raising this overlaps those
+    # waits; it stays at 1 by default to keep SQLite writes uncontended.
+    LOCAL_WORKER_CONCURRENCY = int(os.environ.get("LOCAL_WORKER_CONCURRENCY", "1"))
     PDF_DPI = int(os.environ.get("PDF_DPI", 300))
     PDF_TEXT_MIN_CHARS = int(os.environ.get("PDF_TEXT_MIN_CHARS", "80"))
     PDF_TEXT_MIN_RATIO = float(os.environ.get("PDF_TEXT_MIN_RATIO", "0.9"))
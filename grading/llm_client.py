@@ -1,8 +1,14 @@
 import base64
-import json
+import functools
+import hashlib
 import mimetypes
+import os
 import re
+
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from grading.prompts import (
     SYSTEM_PROMPT,
@@ -13,18 +19,114 @@ from grading.prompts import (
 from grading.schemas import safe_json_loads
 
 
+# Shared session so sequential grading calls reuse keep-alive connections
+# instead of paying a TCP+TLS handshake per request.
+_SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=32,
+    # Retry connection failures only: once the request has been sent, a
+    # completion may already be billed, so read/status errors must not be
+    # replayed behind the caller's back.
+    max_retries=Retry(
+        total=2,
+        connect=2,
+        read=0,
+        status=0,
+        backoff_factor=0.3,
+    ),
+)
+_SESSION.mount("https://", _ADAPTER)
+_SESSION.mount("http://", _ADAPTER)
+
+
 class LLMResponseError(Exception):
-    def __init__(self, message, raw_text=None):
+    def __init__(
+        self,
+        message,
+        raw_text=None,
+        status=None,
+        provider_code=None,
+        provider_param=None,
+        provider_message=None,
+    ):
         super().__init__(message)
         self.raw_text = raw_text
+        self.status = status
+        self.provider_code = provider_code
+        self.provider_param = provider_param
+        self.provider_message = provider_message
+
+    def mentions(self, *needles):
+        haystack = self.provider_message or str(self)
+        return all(needle in haystack for needle in needles)
+
 
+# Opt-in exact-response cache (LLM_RESPONSE_CACHE): repeated grading of an
+# identical prompt/model/image tuple reuses the prior answer instead of
+# paying tokens again. Off by default so explicit reruns stay fresh.
+_RESPONSE_CACHE = {}
+_RESPONSE_CACHE_MAX = 128
 
-def _parse_error_message(text):
+
+def _image_stat_key(path):
     try:
-        data = json.loads(text)
-        return data.get("error", {}).get("message", text)
+        stat = os.stat(path)
+        return (str(path), stat.st_size, stat.st_mtime_ns)
+    except OSError:
+        return (str(path), None, None)
+
+
+def _response_cache_key(model, prompt, image_paths):
+    payload = orjson.dumps(
+        {
+            "model": model,
+            "prompt": prompt,
+            "images": [_image_stat_key(path) for path in image_paths],
+        }
+    )
+    return hashlib.sha256(payload).hexdigest()
+
+
+def _response_cache_store(key, value):
+    if len(_RESPONSE_CACHE) >= _RESPONSE_CACHE_MAX:
+        _RESPONSE_CACHE.pop(next(iter(_RESPONSE_CACHE)))
+    _RESPONSE_CACHE[key] = value
+
+
+def _parse_error_info(body):
+    try:
+        data = orjson.loads(body)
+        error = data.get("error") or {}
+        return error if isinstance(error, dict) else {}
     except Exception:
-        return text
+        return {}
+
+
+# The previous inline pattern double-escaped its backslashes inside a raw
+# string, so it matched literal "\s"/"\{" and never found fenced blocks.
+_FENCED_JSON_RE = re.compile(
+    r"```(?:json)?\s*(\{.*?\})\s*```", re.DOTALL | re.IGNORECASE
+)
+_BRACE_RE = re.compile(r"[{}]")
+
+
+def _extract_top_json(text):
+    # One forward pass over the braces (finditer stays in the regex engine)
+    # returning the first balanced top-level object. Braces inside JSON
+    # strings can fool the depth count, so callers keep a wider fallback.
+    depth = 0
+    start = None
+    for match in _BRACE_RE.finditer(text):
+        if match.group() == "{":
+            if depth == 0:
+                start = match.start()
+            depth += 1
+        elif depth:
+            depth -= 1
+            if depth == 0:
+                return text[start : match.end()]
+    return None
 
 
 def _parse_json_from_text(raw_text):
@@ -35,13 +137,19 @@ def _parse_json_from_text(raw_text):
     if not error:
         return data, "", cleaned
 
-    fenced = re.search(r"```(?:json)?\\s*(\\{.*?\\})\\s*```", cleaned, re.DOTALL | re.IGNORECASE)
+    fenced = _FENCED_JSON_RE.search(cleaned)
     if fenced:
         candidate = fenced.group(1).strip()
         data, error = safe_json_loads(candidate)
         if not error:
             return data, "", candidate
 
+    candidate = _extract_top_json(cleaned)
+    if candidate:
+        data, error = safe_json_loads(candidate)
+        if not error:
+            return data, "", candidate
+
     start = cleaned.find("{")
     end = cleaned.rfind("}")
     if start != -1 and end != -1 and end > start:
@@ -53,38 +161,71 @@ def _parse_json_from_text(raw_text):
     return None, error, cleaned
 
 
-def _encode_image(path):
+# 57KB is a multiple of 3, so chunked encoding emits no mid-stream padding.
+_B64_CHUNK_SIZE = 57 * 1024
+
+
+# Entries are whole data URLs — several MB each for 300 DPI page renders —
+# so keep only a handful: enough to cover rebuilding the fallback message
+# variant within a call without pinning hundreds of MB in a long-lived
+# worker.
+@functools.lru_cache(maxsize=8)
+def _image_data_url_cached(path, _size, _mtime_ns):
     mime_type, _ = mimetypes.guess_type(path)
     if not mime_type:
         mime_type = "image/png"
+    # Encode in chunks so the raw bytes of a multi-MB scan never sit in
+    # memory alongside their full base64 copy.
+    chunks = []
     with open(path, "rb") as image_file:
-        b64_data = base64.b64encode(image_file.read()).decode("ascii")
+        while chunk := image_file.read(_B64_CHUNK_SIZE):
+            chunks.append(base64.b64encode(chunk))
+    b64_data = b"".join(chunks).decode("ascii")
+    return f"data:{mime_type};base64,{b64_data}"
+
+
+def _image_data_url(path):
+    # Keyed on size+mtime so the same page image is base64-encoded once per
+    # revision even when both message shapes (or several jobs) need it.
+    path = str(path)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return _image_data_url_cached.__wrapped__(path, None, None)
+    return _image_data_url_cached(path, stat.st_size, stat.st_mtime_ns)
+
+
+def _encode_image(path):
     return {
         "type": "image_url",
-        "image_url": {"url": f"data:{mime_type};base64,{b64_data}"},
+        "image_url": {"url": _image_data_url(path)},
     }
 
 
 def _encode_image_response(path):
-    mime_type, _ = mimetypes.guess_type(path)
-    if not mime_type:
-        mime_type = "image/png"
-    with open(path, "rb") as image_file:
-        b64_data = base64.b64encode(image_file.read()).decode("ascii")
-    return {"type": "input_image", "image_url": f"data:{mime_type};base64,{b64_data}"}
+    return {"type": "input_image", "image_url": _image_data_url(path)}
 
 
 def _use_responses_api(model):
     return model.startswith("gpt-5")
 
 
+# Shared system messages; the prompt is constant, so build these once and
+# treat them as immutable.
+_SYSTEM_MSG_CHAT = {"role": "system", "content": SYSTEM_PROMPT}
+_SYSTEM_MSG_RESPONSES = {
+    "role": "system",
+    "content": [{"type": "input_text", "text": SYSTEM_PROMPT}],
+}
+
+
 def _build_messages(prompt, image_paths, use_responses):
     if use_responses:
         user_content = [{"type": "input_text", "text": prompt}]
         for path in image_paths:
             user_content.append(_encode_image_response(path))
         return [
-            {"role": "system", "content": [{"type": "input_text", "text": SYSTEM_PROMPT}]},
+            _SYSTEM_MSG_RESPONSES,
             {"role": "user", "content": user_content},
         ]
 
@@ -95,7 +236,7 @@ def _build_messages(prompt, image_paths, use_responses):
     else:
         content = prompt
     return [
-        {"role": "system", "content": SYSTEM_PROMPT},
+        _SYSTEM_MSG_CHAT,
         {"role": "user", "content": content},
     ]
 
@@ -132,19 +273,32 @@ def _chat_completion(
     }
 
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=timeout)
+        # orjson serializes the payload straight to bytes, skipping
+        # requests' stdlib-json encoder on multi-KB prompts.
+        response = _SESSION.post(
+            url, headers=headers, data=orjson.dumps(payload), timeout=timeout
+        )
         response.raise_for_status()
         data = response.json()
     except requests.HTTPError as exc:
         payload_keys = ", ".join(sorted(payload.keys()))
+        # Read the body bytes once: parse for structured fields and keep a
+        # bounded decoded copy instead of re-decoding response.text twice.
+        body = response.content
+        error_info = _parse_error_info(body)
+        body_text = body[:4096].decode("utf-8", "replace")
         raise LLMResponseError(
             (
                 "LLM request failed (Chat Completions). "
                 f"HTTP {response.status_code}. "
-                f"Provider message: {_parse_error_message(response.text)}. "
+                f"Provider message: {error_info.get('message', body_text)}. "
                 f"Request details: model={model}, json_mode={json_mode}, keys=[{payload_keys}]"
             ),
-            raw_text=response.text,
+            raw_text=body_text,
+            status=response.status_code,
+            provider_code=error_info.get("code"),
+            provider_param=error_info.get("param"),
+            provider_message=error_info.get("message"),
         ) from exc
     except requests.RequestException as exc:
         raise LLMResponseError(f"LLM request failed: {exc}") from exc
@@ -159,9 +313,13 @@ def _chat_completion(
         if tool_calls:
             raise LLMResponseError(
                 "LLM returned tool calls instead of content",
-                raw_text=json.dumps(message),
+                raw_text=orjson.dumps(message).decode(),
             )
-        raise LLMResponseError("LLM returned empty content", raw_text=json.dumps(message))
+        raise LLMResponseError(
+            "LLM returned empty content",
+            raw_text=orjson.dumps(message).decode(),
+            provider_code="empty_content",
+        )
     usage = data.get("usage", {})
     return content, usage
 
@@ -184,7 +342,7 @@ def _extract_responses_text(data):
             elif content_type == "refusal":
                 refusal = content.get("refusal") or ""
                 raise LLMResponseError(
-                    f"LLM refusal: {refusal}", raw_text=json.dumps(data)
+                    f"LLM refusal: {refusal}", raw_text=orjson.dumps(data).decode()
                 )
 
     return "".join(texts)
@@ -226,19 +384,30 @@ def _responses_completion(
 
     def _post(payload):
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=timeout)
+            response = _SESSION.post(
+                url, headers=headers, data=orjson.dumps(payload), timeout=timeout
+            )
             response.raise_for_status()
             return response.json()
         except requests.HTTPError as exc:
             payload_keys = ", ".join(sorted(payload.keys()))
+            # Read the body bytes once: parse for structured fields and keep a
+            # bounded decoded copy instead of re-decoding response.text twice.
+            body = response.content
+            error_info = _parse_error_info(body)
+            body_text = body[:4096].decode("utf-8", "replace")
             raise LLMResponseError(
                 (
                     "LLM request failed (Responses API). "
                     f"HTTP {response.status_code}. "
-                    f"Provider message: {_parse_error_message(response.text)}. "
+                    f"Provider message: {error_info.get('message', body_text)}. "
                     f"Request details: model={model}, json_mode={json_mode}, keys=[{payload_keys}]"
                 ),
-                raw_text=response.text,
+                raw_text=body_text,
+                status=response.status_code,
+                provider_code=error_info.get("code"),
+                provider_param=error_info.get("param"),
+                provider_message=error_info.get("message"),
             ) from exc
         except requests.RequestException as exc:
             raise LLMResponseError(f"LLM request failed: {exc}") from exc
@@ -257,14 +426,15 @@ def _responses_completion(
             payload["response_format"] = {"type": "json_object"}
             data = _post(payload)
         except LLMResponseError as exc:
-            message = str(exc)
-            if "text.format" in message or "response_format" in message:
+            if exc.provider_param in ("text.format", "response_format") or exc.mentions(
+                "text.format"
+            ) or exc.mentions("response_format"):
                 try:
                     payload = dict(base_payload)
                     payload["text"] = {"format": {"type": "json_object"}}
                     data = _post(payload)
                 except LLMResponseError as exc_text:
-                    if "Unrecognized request argument supplied: text" in str(exc_text):
+                    if exc_text.mentions("Unrecognized request argument supplied: text"):
                         data = _post(base_payload)
                     else:
                         raise
@@ -278,13 +448,15 @@ def _responses_completion(
         max_tokens_used = data.get("max_output_tokens")
         raise LLMResponseError(
             f"LLM response incomplete: reason={reason}, max_output_tokens={max_tokens_used}",
-            raw_text=json.dumps(data),
+            raw_text=orjson.dumps(data).decode(),
         )
 
     content = _extract_responses_text(data)
     if not content.strip():
         raise LLMResponseError(
-            "LLM returned empty content", raw_text=json.dumps(data)
+            "LLM returned empty content",
+            raw_text=orjson.dumps(data).decode(),
+            provider_code="empty_content",
         )
     usage = _normalize_usage(data)
     return content, usage
@@ -304,6 +476,7 @@ def grade_submission_and_raw(
     json_mode=True,
     max_tokens=800,
     timeout=120,
+    response_cache=False,
 ):
     prompt = build_grading_prompt(
         assignment_text,
@@ -313,9 +486,24 @@ def grade_submission_and_raw(
         formatted_output=formatted_output,
         additional_instructions=additional_instructions,
     )
+    cache_key = None
+    if response_cache:
+        cache_key = _response_cache_key(model, prompt, image_paths)
+        cached = _RESPONSE_CACHE.get(cache_key)
+        if cached is not None:
+            data, raw_text, usage, meta = cached
+            return data, raw_text, usage, dict(meta, cache_hit=True)
     use_responses = _use_responses_api(model)
-    responses_messages = _build_messages(prompt, image_paths, True)
-    chat_messages = _build_messages(prompt, image_paths, False)
+    # Built on first use: the fallback variant is rarely needed and image
+    # payloads make the unused build expensive.
+    messages_cache = {}
+
+    def _messages(for_responses):
+        if for_responses not in messages_cache:
+            messages_cache[for_responses] = _build_messages(
+                prompt, image_paths, for_responses
+            )
+        return messages_cache[for_responses]
 
     api_used = "responses" if use_responses else "chat"
     api_fallback = False
@@ -324,7 +512,7 @@ def grade_submission_and_raw(
     def _call(api, json_enabled):
         if api == "responses":
             return _responses_completion(
-                responses_messages,
+                _messages(True),
                 model,
                 endpoint,
                 api_key,
@@ -333,7 +521,7 @@ def grade_submission_and_raw(
                 timeout=timeout,
             )
         return _chat_completion(
-            chat_messages,
+            _messages(False),
             model,
             endpoint,
             api_key,
@@ -345,15 +533,18 @@ def grade_submission_and_raw(
     try:
         raw_text, usage = _call(api_used, json_mode)
     except LLMResponseError as exc:
-        message = str(exc)
-        if api_used == "responses" and "Unrecognized request argument supplied: text" in message:
+        if api_used == "responses" and exc.mentions(
+            "Unrecognized request argument supplied: text"
+        ):
             api_used = "chat"
             api_fallback = True
             raw_text, usage = _call(api_used, json_mode)
-        elif json_mode and "empty content" in message.lower():
+        elif json_mode and exc.provider_code == "empty_content":
             raw_text, usage = _call(api_used, False)
             json_fallback = True
-        elif "Unsupported parameter" in message and "text.format" in message:
+        elif exc.provider_param == "text.format" or exc.mentions(
+            "Unsupported parameter", "text.format"
+        ):
             api_used = "responses"
             api_fallback = False
             raw_text, usage = _call(api_used, False)
@@ -367,6 +558,8 @@ def grade_submission_and_raw(
         "api_used": api_used,
         "api_fallback": api_fallback,
     }
+    if cache_key is not None:
+        _response_cache_store(cache_key, (data, raw_text, usage, meta))
     return data, raw_text, usage, meta
 
 
@@ -415,8 +608,16 @@ def generate_rubric_draft(
         additional_instructions=additional_instructions,
     )
     use_responses = _use_responses_api(model)
-    responses_messages = _build_messages(prompt, [], True)
-    chat_messages = _build_messages(prompt, [], False)
+    # Built on first use: the fallback variant is rarely needed and image
+    # payloads make the unused build expensive.
+    messages_cache = {}
+
+    def _messages(for_responses):
+        if for_responses not in messages_cache:
+            messages_cache[for_responses] = _build_messages(
+                prompt, [], for_responses
+            )
+        return messages_cache[for_responses]
 
     api_used = "responses" if use_responses else "chat"
     api_fallback = False
@@ -425,7 +626,7 @@ def generate_rubric_draft(
     def _call(api, json_enabled):
         if api == "responses":
             return _responses_completion(
-                responses_messages,
+                _messages(True),
                 model,
                 endpoint,
                 api_key,
@@ -434,7 +635,7 @@ def generate_rubric_draft(
                 timeout=timeout,
             )
         return _chat_completion(
-            chat_messages,
+            _messages(False),
             model,
             endpoint,
             api_key,
@@ -446,15 +647,18 @@ def generate_rubric_draft(
     try:
         raw_text, usage = _call(api_used, json_mode)
     except LLMResponseError as exc:
-        message = str(exc)
-        if api_used == "responses" and "Unrecognized request argument supplied: text" in message:
+        if api_used == "responses" and exc.mentions(
+            "Unrecognized request argument supplied: text"
+        ):
             api_used = "chat"
             api_fallback = True
             raw_text, usage = _call(api_used, json_mode)
-        elif json_mode and "empty content" in message.lower():
+        elif json_mode and exc.provider_code == "empty_content":
             raw_text, usage = _call(api_used, False)
             json_fallback = True
-        elif "Unsupported parameter" in message and "text.format" in message:
+        elif exc.provider_param == "text.format" or exc.mentions(
+            "Unsupported parameter", "text.format"
+        ):
             api_used = "responses"
             api_fallback = False
             raw_text, usage = _call(api_used, False)
@@ -488,8 +692,16 @@ def generate_assignment_draft(
         additional_instructions=additional_instructions,
     )
     use_responses = _use_responses_api(model)
-    responses_messages = _build_messages(prompt, [], True)
-    chat_messages = _build_messages(prompt, [], False)
+    # Built on first use: the fallback variant is rarely needed and image
+    # payloads make the unused build expensive.
+    messages_cache = {}
+
+    def _messages(for_responses):
+        if for_responses not in messages_cache:
+            messages_cache[for_responses] = _build_messages(
+                prompt, [], for_responses
+            )
+        return messages_cache[for_responses]
 
     api_used = "responses" if use_responses else "chat"
     api_fallback = False
@@ -498,7 +710,7 @@ def generate_assignment_draft(
     def _call(api, json_enabled):
         if api == "responses":
             return _responses_completion(
-                responses_messages,
+                _messages(True),
                 model,
                 endpoint,
                 api_key,
@@ -507,7 +719,7 @@ def generate_assignment_draft(
                 timeout=timeout,
             )
         return _chat_completion(
-            chat_messages,
+            _messages(False),
             model,
             endpoint,
             api_key,
@@ -519,15 +731,18 @@ def generate_assignment_draft(
     try:
         raw_text, usage = _call(api_used, json_mode)
     except LLMResponseError as exc:
-        message = str(exc)
-        if api_used == "responses" and "Unrecognized request argument supplied: text" in message:
+        if api_used == "responses" and exc.mentions(
+            "Unrecognized request argument supplied: text"
+        ):
             api_used = "chat"
             api_fallback = True
             raw_text, usage = _call(api_used, json_mode)
-        elif json_mode and "empty content" in message.lower():
+        elif json_mode and exc.provider_code == "empty_content":
             raw_text, usage = _call(api_used, False)
             json_fallback = True
-        elif "Unsupported parameter" in message and "text.format" in message:
+        elif exc.provider_param == "text.format" or exc.mentions(
+            "Unsupported parameter", "text.format"
+        ):
             api_used = "responses"
             api_fallback = False
             raw_text, usage = _call(api_used, False)
@@ -1,3 +1,5 @@
+import functools
+
 MODEL_PRICES_PER_1K = {
     "gpt-5": (0.00125, 0.01),
     "gpt-5-mini": (0.00025, 0.002),
@@ -7,12 +9,21 @@ MODEL_PRICES_PER_1K = {
 }
 
 
+# Prefix strings precomputed once so the lookup loop allocates nothing.
+_PRICE_PREFIXES = [(key, f"{key}-") for key in MODEL_PRICES_PER_1K]
+
+
+@functools.lru_cache(maxsize=128)
 def normalize_model_name(model):
     if not model:
         return ""
     model = model.lower()
-    for key in MODEL_PRICES_PER_1K:
-        if model == key or model.startswith(f"{key}-"):
+    # Exact table entries win before any prefix matching, so e.g.
+    # gpt-5-mini resolves to its own rate rather than the gpt-5 prefix.
+    if model in MODEL_PRICES_PER_1K:
+        return model
+    for key, prefix in _PRICE_PREFIXES:
+        if model == key or model.startswith(prefix):
             return key
     return model
 
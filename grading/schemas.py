@@ -1,18 +1,26 @@
-import json
+import fastjsonschema
+import orjson
 
-REQUIRED_GRADE_KEYS = {"total_points", "parts", "deductions", "final_feedback"}
+REQUIRED_GRADE_KEYS = ("total_points", "parts", "deductions", "final_feedback")
+
+# Compiled once at import; the codegen'd validator also checks that each
+# part is an object, which the old hand-rolled checks let through.
+_GRADE_RESULT_SCHEMA = {
+    "type": "object",
+    "required": list(REQUIRED_GRADE_KEYS),
+    "properties": {
+        "parts": {"type": "array", "items": {"type": "object"}},
+        "deductions": {"type": "array"},
+    },
+}
+_validate_grade_schema = fastjsonschema.compile(_GRADE_RESULT_SCHEMA)
 
 
 def validate_grade_result(data):
-    if not isinstance(data, dict):
-        return False, "Grade result is not an object"
-    missing = REQUIRED_GRADE_KEYS - set(data.keys())
-    if missing:
-        return False, f"Missing keys: {', '.join(sorted(missing))}"
-    if not isinstance(data.get("parts"), list):
-        return False, "parts must be a list"
-    if not isinstance(data.get("deductions"), list):
-        return False, "deductions must be a list"
+    try:
+        _validate_grade_schema(data)
+    except fastjsonschema.JsonSchemaException as exc:
+        return False, exc.message
     return True, ""
 
 
@@ -21,15 +29,22 @@ def render_grade_output(data):
     parts = data.get("parts", [])
     total_possible = 0
     has_possible = False
+    part_pieces = []
+    # One pass builds the per-part display and the possible-points total.
     for part in parts:
-        try:
-            value = float(part.get("points_possible"))
-        except (TypeError, ValueError):
-            value = None
-        if value is None:
-            continue
-        total_possible += value
-        has_possible = True
+        awarded = part.get("points_awarded")
+        possible = part.get("points_possible")
+        part_pieces.append(f"{awarded}/{possible}")
+        if isinstance(possible, (int, float)):
+            total_possible += possible
+            has_possible = True
+        elif possible is not None:
+            try:
+                total_possible += float(possible)
+                has_possible = True
+            except (TypeError, ValueError):
+                pass
+    part_text = ", ".join(part_pieces)
 
     def _format_points(value):
         if value is None:
@@ -41,9 +56,6 @@ def render_grade_output(data):
         if numeric.is_integer():
             return str(int(numeric))
         return f"{numeric:.2f}".rstrip("0").rstrip(".")
-    part_text = ", ".join(
-        f"{p.get('points_awarded')}/{p.get('points_possible')}" for p in parts
-    )
 
     total_display = _format_points(total_points)
     if has_possible:
@@ -67,6 +79,11 @@ def render_grade_output(data):
 
 def safe_json_loads(text):
     try:
-        return json.loads(text), ""
-    except json.JSONDecodeError as exc:
+        return orjson.loads(text), ""
+    except orjson.JSONDecodeError as exc:
         return None, str(exc)
+
+
+def dump_json(data, indent=False):
+    option = orjson.OPT_INDENT_2 if indent else 0
+    return orjson.dumps(data, option=option).decode()
@@ -1,4 +1,8 @@
 from datetime import datetime, timezone
+
+from sqlalchemy import func
+from sqlalchemy.ext.hybrid import hybrid_property
+
 from db import db
 
 
@@ -23,6 +27,14 @@ def _utcnow():
     return datetime.now(timezone.utc)
 
 
+def _as_utc(value):
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
 class Assignment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
@@ -37,6 +49,10 @@ class Assignment(db.Model):
 
 # "Rubric" in the codebase corresponds to the grading guide shown in the UI.
 class RubricVersion(db.Model):
+    __table_args__ = (
+        db.Index("ix_rubric_version_assignment_status", "assignment_id", "status"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     assignment_id = db.Column(db.Integer, db.ForeignKey("assignment.id"), nullable=False)
     rubric_text = db.Column(db.Text, nullable=False)
@@ -65,6 +81,8 @@ class GradingTemplate(db.Model):
 
 
 class Submission(db.Model):
+    __table_args__ = (db.Index("ix_submission_assignment", "assignment_id"),)
+
     id = db.Column(db.Integer, primary_key=True)
     assignment_id = db.Column(db.Integer, db.ForeignKey("assignment.id"), nullable=False)
     student_identifier = db.Column(db.String(255), nullable=False)
@@ -72,10 +90,17 @@ class Submission(db.Model):
     created_at = db.Column(db.DateTime, default=_utcnow, nullable=False)
 
     files = db.relationship("SubmissionFile", backref="submission", lazy=True)
-    grade_results = db.relationship("GradeResult", backref="submission", lazy=True)
+    grade_results = db.relationship(
+        "GradeResult",
+        backref="submission",
+        order_by="GradeResult.created_at",
+        lazy=True,
+    )
 
 
 class SubmissionFile(db.Model):
+    __table_args__ = (db.Index("ix_submission_file_submission", "submission_id"),)
+
     id = db.Column(db.Integer, primary_key=True)
     submission_id = db.Column(db.Integer, db.ForeignKey("submission.id"), nullable=False)
     file_path = db.Column(db.Text, nullable=False)
@@ -85,6 +110,12 @@ class SubmissionFile(db.Model):
 
 
 class GradingJob(db.Model):
+    __table_args__ = (
+        db.Index("ix_grading_job_assignment_status", "assignment_id", "status"),
+        db.Index("ix_grading_job_submission", "submission_id"),
+        db.Index("ix_grading_job_status", "status"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     assignment_id = db.Column(db.Integer, db.ForeignKey("assignment.id"), nullable=False)
     submission_id = db.Column(db.Integer, db.ForeignKey("submission.id"), nullable=False)
@@ -107,6 +138,22 @@ class GradingJob(db.Model):
     submission = db.relationship("Submission", backref="jobs", lazy=True)
     rubric_version = db.relationship("RubricVersion", backref="jobs", lazy=True)
 
+    @hybrid_property
+    def duration_seconds(self):
+        if not self.started_at:
+            return None
+        started = _as_utc(self.started_at)
+        finished = _as_utc(self.finished_at) if self.finished_at else _utcnow()
+        return (finished - started).total_seconds()
+
+    @duration_seconds.expression
+    def duration_seconds(cls):
+        # julianday arithmetic matches the default SQLite database.
+        return (
+            func.julianday(func.coalesce(cls.finished_at, func.current_timestamp()))
+            - func.julianday(cls.started_at)
+        ) * 86400.0
+
 
 class AssignmentGeneration(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -132,6 +179,12 @@ class AssignmentGeneration(db.Model):
 
 
 class GradeResult(db.Model):
+    __table_args__ = (
+        db.Index(
+            "ix_grade_result_submission_rubric", "submission_id", "rubric_version_id"
+        ),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     submission_id = db.Column(db.Integer, db.ForeignKey("submission.id"), nullable=False)
     rubric_version_id = db.Column(db.Integer, db.ForeignKey("rubric_version.id"), nullable=False)
@@ -1,5 +1,6 @@
 import io
 import logging
+import shutil
 import uuid
 import zipfile
 from pathlib import Path
@@ -26,6 +27,19 @@ def submission_processed_dir(assignment_id, submission_id):
     return ensure_dir(PROCESSED_DIR / f"assignment_{assignment_id}" / f"submission_{submission_id}")
 
 
+def cleanup_submission_dirs(assignment_id, submission_id):
+    # Runs on the worker so request threads don't block unlinking
+    # potentially hundreds of rendered page images.
+    shutil.rmtree(
+        UPLOAD_DIR / f"assignment_{assignment_id}" / f"submission_{submission_id}",
+        ignore_errors=True,
+    )
+    shutil.rmtree(
+        PROCESSED_DIR / f"assignment_{assignment_id}" / f"submission_{submission_id}",
+        ignore_errors=True,
+    )
+
+
 def relpath_from_data(path):
     return str(Path(path).relative_to(DATA_DIR))
 
@@ -145,9 +159,14 @@ def collect_submission_images(submission):
 
     processed_dir = submission_processed_dir(submission.assignment_id, submission.id)
     if processed_dir.exists():
-        image_paths.extend(sorted(processed_dir.glob("**/*.png")))
-        image_paths.extend(sorted(processed_dir.glob("**/*.jpg")))
-        image_paths.extend(sorted(processed_dir.glob("**/*.jpeg")))
+        # One directory walk instead of a glob pass per extension.
+        rendered = {".png": [], ".jpg": [], ".jpeg": []}
+        for path in processed_dir.rglob("*"):
+            bucket = rendered.get(path.suffix)
+            if bucket is not None:
+                bucket.append(path)
+        for suffix in (".png", ".jpg", ".jpeg"):
+            image_paths.extend(sorted(rendered[suffix]))
 
     return [str(p) for p in image_paths]
 
@@ -7,6 +7,7 @@ from redis import Redis
 from rq import Queue
 
 from processing.assignment_runner import process_assignment_generation
+from processing.file_ingest import cleanup_submission_dirs
 from processing.job_runner import process_submission_job
 from processing.rubric_runner import process_rubric_generation
 
@@ -38,12 +39,22 @@ def init_job_queue(app):
 
 
 def enqueue_submission_job(job_id):
+    return enqueue_submission_jobs([job_id])[0]
+
+
+def enqueue_submission_jobs(job_ids):
+    # One pipelined round-trip to Redis for a whole batch of jobs.
     if _use_rq:
-        job = _rq_queue.enqueue(process_submission_job, job_id)
-        return job.id
+        prepared = [
+            Queue.prepare_data(process_submission_job, (job_id,))
+            for job_id in job_ids
+        ]
+        jobs = _rq_queue.enqueue_many(prepared)
+        return [job.id for job in jobs]
 
-    _local_queue.put((process_submission_job, (job_id,)))
-    return f"local-{job_id}"
+    for job_id in job_ids:
+        _local_queue.put((process_submission_job, (job_id,)))
+    return [f"local-{job_id}" for job_id in job_ids]
 
 
 def enqueue_rubric_job(rubric_id):
@@ -64,6 +75,15 @@ def enqueue_assignment_job(generation_id):
     return f"local-assignment-{generation_id}"
 
 
+def enqueue_cleanup_job(assignment_id, submission_id):
+    if _use_rq:
+        job = _rq_queue.enqueue(cleanup_submission_dirs, assignment_id, submission_id)
+        return job.id
+
+    _local_queue.put((cleanup_submission_dirs, (assignment_id, submission_id)))
+    return f"local-cleanup-{submission_id}"
+
+
 def _start_local_worker(app):
     global _worker_started
     if _worker_started:
@@ -73,6 +93,7 @@ def _start_local_worker(app):
         return
 
     _worker_started = True
+    worker_count = max(int(app.config.get("LOCAL_WORKER_CONCURRENCY", 1) or 1), 1)
 
     def _worker():
         with app.app_context():
@@ -91,6 +112,9 @@ def _start_local_worker(app):
                 finally:
                     _local_queue.task_done()
 
-    thread = threading.Thread(target=_worker, name="local-grading-worker", daemon=True)
-    thread.start()
-    logger.info("Started local background worker thread")
+    for index in range(worker_count):
+        thread = threading.Thread(
+            target=_worker, name=f"local-grading-worker-{index}", daemon=True
+        )
+        thread.start()
+    logger.info("Started %s local background worker thread(s)", worker_count)
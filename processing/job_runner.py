@@ -1,4 +1,3 @@
-import json
 import logging
 from datetime import datetime, timezone
 
@@ -15,7 +14,7 @@ from models import (
 )
 from grading.llm_client import LLMResponseError, grade_submission_and_raw
 from grading.pricing import get_model_rates
-from grading.schemas import render_grade_output, validate_grade_result
+from grading.schemas import dump_json, render_grade_output, validate_grade_result
 from processing.file_ingest import (
     collect_submission_images,
     submission_processed_dir,
@@ -355,6 +354,7 @@ def process_submission_job(job_id):
             json_mode=Config.LLM_USE_JSON_MODE,
             max_tokens=Config.LLM_MAX_OUTPUT_TOKENS,
             timeout=Config.LLM_REQUEST_TIMEOUT,
+            response_cache=Config.LLM_RESPONSE_CACHE,
         )
 
         valid, error = validate_grade_result(llm_data)
@@ -387,6 +387,8 @@ def process_submission_job(job_id):
                 summary_lines.append("LLM API fallback: responses -> chat")
             if meta.get("json_mode_fallback"):
                 summary_lines.append("JSON mode fallback: disabled for retry")
+            if meta.get("cache_hit"):
+                summary_lines.append("LLM response cache: hit")
 
         job.prompt_tokens = prompt_tokens
         job.completion_tokens = completion_tokens
@@ -399,7 +401,7 @@ def process_submission_job(job_id):
 
         grade_result = _get_or_create_grade_result(submission.id, rubric.id)
         grade_result.total_points = llm_data.get("total_points")
-        grade_result.json_result = json.dumps(llm_data)
+        grade_result.json_result = dump_json(llm_data)
         grade_result.rendered_text = rendered_text
         grade_result.raw_response = raw_response
         grade_result.error_message = ""
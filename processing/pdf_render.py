@@ -1,5 +1,7 @@
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import logging
+import os
 from pdf2image import convert_from_path
 
 logger = logging.getLogger(__name__)
@@ -15,12 +17,19 @@ def render_pdf_to_images(pdf_path, out_dir, dpi=300):
         logger.info("Using existing rendered images for %s", pdf_path)
         return [str(p) for p in existing]
 
-    images = convert_from_path(str(pdf_path), dpi=dpi)
-    output_paths = []
-    for idx, image in enumerate(images, start=1):
+    worker_count = min(4, os.cpu_count() or 1)
+    images = convert_from_path(str(pdf_path), dpi=dpi, thread_count=worker_count)
+
+    def _save_page(item):
+        idx, image = item
         out_path = out_dir / f"page_{idx:03}.png"
         image.save(out_path, "PNG")
-        output_paths.append(str(out_path))
+        return str(out_path)
+
+    # PNG encoding happens mostly outside the GIL, so pages encode in
+    # parallel; map() keeps the page order stable.
+    with ThreadPoolExecutor(max_workers=worker_count) as pool:
+        output_paths = list(pool.map(_save_page, enumerate(images, start=1)))
 
     logger.info("Rendered %s pages for %s", len(output_paths), pdf_path)
     return output_paths
@@ -1,10 +1,10 @@
-import json
 import logging
 from datetime import datetime, timezone
 
 from config import Config
 from db import db
 from grading.llm_client import LLMResponseError, generate_rubric_draft
+from grading.schemas import dump_json
 from grading.pricing import get_model_rates
 from models import Assignment, RubricStatus, RubricVersion
 
@@ -53,7 +53,7 @@ def _normalize_text(value, field_name):
     if isinstance(value, list) and all(isinstance(item, str) for item in value):
         return "\n".join(item.strip() for item in value if item is not None).strip()
     if isinstance(value, dict) or isinstance(value, list):
-        return json.dumps(value, ensure_ascii=True, indent=2)
+        return dump_json(value, indent=True)
     raise ValueError(
         f"Draft response expected {field_name} as string or object, got {type(value).__name__}."
     )